@@ -3,5 +3,13 @@
 # License: GPL v.3 https://www.gnu.org/copyleft/gpl.html
 if __name__ == '__main__':
     import sys
-    from resources.lib.items.router import Router
-    Router(int(sys.argv[1]), sys.argv[2][1:]).run()
+    from resources.lib.addon.importtime import ImportProfiler
+    with ImportProfiler('plugin'):
+        from resources.lib.items.remote import get_remote_directory
+        from resources.lib.files.scache import flush_writers
+        try:
+            if not get_remote_directory(int(sys.argv[1]), sys.argv[2][1:]):
+                from resources.lib.items.router import Router
+                Router(int(sys.argv[1]), sys.argv[2][1:]).run()
+        finally:
+            flush_writers()  # Writer threads are daemons so commit queued cache rows before interpreter exits
@@ -0,0 +1,122 @@
+import sys
+from time import perf_counter as timer
+from _thread import get_ident
+
+""" Lazyimports
+from xbmcaddon import Addon
+from resources.lib.files.futils import write_to_file
+from resources.lib.addon.logger import kodi_log
+"""
+
+# NOTE: Keep module level imports to the standard library so profiler can be entered before addon modules load
+ADDON_ID = 'plugin.video.themoviedb.helper'
+REPORT_FOLDER = 'import_profile'
+REPORT_LIMIT = 100  # Number of modules listed in report
+
+
+class _TimedLoader(object):
+    """ Wraps a module loader to time how long the module takes to execute """
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler.start(module.__name__)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler.stop(module.__name__)
+
+
+class _TimedFinder(object):
+    """ Meta path finder which defers to the other finders and wraps the loader they return """
+    def __init__(self, profiler):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader and hasattr(spec.loader, 'exec_module'):
+                spec.loader = _TimedLoader(spec.loader, self._profiler)
+            return spec
+
+
+class ImportProfiler(object):
+    """
+    Records self and cumulative import time of each module loaded within the context
+    Report is written to addon_data/import_profile/{entry_point}.txt when import_profiler setting is enabled
+    """
+    def __init__(self, entry_point, enabled=None):
+        self.entry_point = entry_point
+        self.enabled = self.is_enabled() if enabled is None else enabled
+        self.results = []  # (module_name, self_time, cumulative_time, depth)
+        self._stacks = {}  # thread_id: [[module_name, time_start, time_children]]
+        self._finder = _TimedFinder(self)
+        self._timer_start = None
+
+    @staticmethod
+    def is_enabled():
+        from xbmcaddon import Addon
+        try:
+            return Addon(ADDON_ID).getSettingBool('import_profiler')
+        except (RuntimeError, TypeError):
+            return False
+
+    def start(self, module_name):
+        self._stacks.setdefault(get_ident(), []).append([module_name, timer(), 0])
+
+    def stop(self, module_name):
+        stack = self._stacks.get(get_ident())
+        if not stack:
+            return
+        name, time_start, time_children = stack.pop()
+        time_total = timer() - time_start
+        if stack:
+            stack[-1][2] += time_total
+        self.results.append((name, time_total - time_children, time_total, len(stack)))
+
+    def get_report(self, label=None):
+        time_total = timer() - self._timer_start
+        time_import = sum(i[2] for i in self.results if not i[3])
+        report = [
+            f'Entry point: {self.entry_point} {label or ""}',
+            f'Total time: {time_total:.4f}s',
+            f'Import time: {time_import:.4f}s ({len(self.results)} modules)',
+            '',
+            f'{"self":>10} | {"cumulative":>10} | module']
+        for name, time_self, time_cumulative, depth in sorted(self.results, key=lambda x: x[2], reverse=True)[:REPORT_LIMIT]:
+            report.append(f'{time_self:10.4f} | {time_cumulative:10.4f} | {"  " * depth}{name}')
+        return '\n'.join(report)
+
+    def write_report(self, label=None):
+        from resources.lib.files.futils import write_to_file
+        from resources.lib.addon.logger import kodi_log
+        report = self.get_report(label)
+        write_to_file(report, REPORT_FOLDER, f'{self.entry_point}.txt')
+        kodi_log(report, 2)
+
+    def __enter__(self):
+        if not self.enabled:
+            return self
+        self._timer_start = timer()
+        sys.meta_path.insert(0, self._finder)
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if not self.enabled:
+            return
+        try:
+            sys.meta_path.remove(self._finder)
+        except ValueError:
+            pass
+        self.write_report(' '.join(sys.argv[1:]))
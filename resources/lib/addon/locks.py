@@ -0,0 +1,116 @@
+import sqlite3
+from threading import Lock
+from contextlib import contextmanager
+from time import perf_counter as timer
+from resources.lib.addon.logger import kodi_log
+
+""" Lazyimports
+from hashlib import md5
+from resources.lib.files.futils import get_file_path
+"""
+
+
+LOCKS_FOLDER = 'locks'
+LOCK_LOG_WAIT = 1  # Log acquisitions that waited longer than this many seconds
+
+_locks = {}  # name: ProcessLock -- one per name so threads in process queue on threading.Lock before file lock
+_locks_lock = Lock()
+
+
+def get_process_lock(name):
+    """ Get shared ProcessLock for name in this process """
+    with _locks_lock:
+        try:
+            return _locks[name]
+        except KeyError:
+            lock = _locks[name] = ProcessLock(name)
+            return lock
+
+
+@contextmanager
+def use_process_lock(name, timeout=10):
+    """ ContextManager to hold ProcessLock for name. Yields False if lock timed out and caller continues unlocked """
+    lock = get_process_lock(name)
+    acquired = lock.acquire(timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            lock.release()
+
+
+def get_lock_stats():
+    """ Contention metrics for locks used in this process {name: {acquired, contended, timeouts, wait_time}} """
+    return {k: dict(v.stats) for k, v in _locks.items()}
+
+
+class ProcessLock(object):
+    """
+    Mutual exclusion between threads and between Kodi processes (plugin / script / service)
+    Threads in the same process wait on a threading.Lock and only the holder takes the file lock
+    File lock is a SQLite BEGIN IMMEDIATE transaction on a lock database per name so acquisition is atomic
+    """
+    def __init__(self, name):
+        self.name = name
+        self.stats = {'acquired': 0, 'contended': 0, 'timeouts': 0, 'wait_time': 0.0}
+        self._lock = Lock()
+        self._connection = None
+
+    def _get_connection(self):
+        if self._connection:
+            return self._connection
+        from hashlib import md5
+        from resources.lib.files.futils import get_file_path
+        path = get_file_path(LOCKS_FOLDER, f'{md5(self.name.encode()).hexdigest()}.db')
+        self._connection = sqlite3.connect(path, timeout=0, isolation_level=None, check_same_thread=False)
+        return self._connection
+
+    def _acquire_file(self, timeout):
+        """ Returns tuple of (acquired, contended) """
+        try:
+            connection = self._get_connection()
+            try:
+                connection.execute('BEGIN IMMEDIATE')  # Fast path when no other process holds lock
+                return (True, False)
+            except sqlite3.OperationalError:
+                pass
+            connection.execute(f'PRAGMA busy_timeout = {max(int(timeout * 1000), 0)}')  # SQLite backs off between retries
+            try:
+                connection.execute('BEGIN IMMEDIATE')
+                return (True, True)
+            finally:
+                connection.execute('PRAGMA busy_timeout = 0')
+        except sqlite3.OperationalError as exc:
+            if 'locked' not in f'{exc}':  # Lock database unusable so don't block callers forever
+                kodi_log(f'ProcessLock {self.name} unavailable!\n{exc}', 1)
+                self._connection = None
+            return (False, True)
+
+    def acquire(self, timeout=10):
+        """ Wait up to timeout seconds for lock. Returns True if acquired """
+        time_start = timer()
+        contended = not self._lock.acquire(blocking=False)
+        if contended and not self._lock.acquire(timeout=timeout):
+            return self._on_acquired(False, contended, timer() - time_start)
+        acquired, file_contended = self._acquire_file(timeout - (timer() - time_start))
+        if not acquired:
+            self._lock.release()
+        return self._on_acquired(acquired, contended or file_contended, timer() - time_start)
+
+    def _on_acquired(self, acquired, contended, wait_time):
+        self.stats['acquired'] += 1 if acquired else 0
+        self.stats['contended'] += 1 if contended else 0
+        self.stats['timeouts'] += 0 if acquired else 1
+        self.stats['wait_time'] += wait_time
+        if not acquired:
+            kodi_log(f'{self.name} Timeout!', 1)
+        elif wait_time > LOCK_LOG_WAIT:
+            kodi_log(f'{self.name} waited {wait_time:.3f}s for lock ({self.stats["contended"]}/{self.stats["acquired"]} contended)', 2)
+        return acquired
+
+    def release(self):
+        try:
+            self._connection.execute('ROLLBACK')
+        except (sqlite3.Error, AttributeError):
+            pass
+        self._lock.release()
@@ -1,39 +1,25 @@
 
 from xbmc import Monitor
-from threading import Thread
+from threading import Thread, Lock, Event
+from queue import Queue, Empty
 from resources.lib.addon.plugin import get_setting, encode_url
-from resources.lib.addon.logger import kodi_log
-from resources.lib.addon.tmdate import set_timestamp, get_timestamp
-from resources.lib.addon.window import get_property
+from resources.lib.addon.logger import kodi_traceback
+from resources.lib.addon.locks import use_process_lock
 
 
-def has_property_lock(property_name, timeout=5, polling=0.05):
-    """ Checks for a window property lock and wait for it to be cleared before continuing
-    Returns True after property clears if was locked
+POOL_DEFAULT_THREADS = 20  # Pool size when max_threads setting is unlimited
+POOL_IDLE_TIMEOUT = 10  # Seconds before an idle pool worker thread exits
+
+
+def use_thread_lock(lock_name, timeout=10, combine_name=False):
+    """ Decorator to run func while holding ProcessLock for lock_name so only one thread in any process runs it at once
+    After timeout func runs anyway rather than failing the caller
     """
-    if not get_property(property_name):
-        return False
-    monitor = Monitor()
-    timeend = set_timestamp(timeout)
-    timeexp = True
-    while not monitor.abortRequested() and get_property(property_name) and timeexp:
-        monitor.waitForAbort(polling)
-        timeexp = get_timestamp(timeend)
-    if not timeexp:
-        kodi_log(f'{property_name} Timeout!', 1)
-    del monitor
-    return True
-
-
-def use_thread_lock(property_name, timeout=10, polling=0.05, combine_name=False):
     def decorator(func):
         def wrapper(self, *args, **kwargs):
-            name = encode_url(f"{property_name}.{'.'.join(args)}", **kwargs) if combine_name else property_name
-            if not has_property_lock(name, timeout, polling):  # Check if locked and wait if it is
-                get_property(name, 1)  # Lock thread for others
-            response = func(self, *args, **kwargs)  # Get our response
-            get_property(name, clear_property=True)  # Unlock for other threads
-            return response
+            name = encode_url(f"{lock_name}.{'.'.join(args)}", **kwargs) if combine_name else lock_name
+            with use_process_lock(name, timeout):
+                return func(self, *args, **kwargs)
         return wrapper
     return decorator
 
@@ -45,39 +31,138 @@ class ParallelThread():
             pass
             item_queue = pt.queue
         item_queue[x]  # to get returned items
+        Items are submitted to the shared ThreadPool and pt.futures holds a ThreadFuture for each item
+        Set pt._exit = True inside the block to leave without waiting -- pool finishes items and pt.queue is not filled
         """
-        mon = Monitor()
-        thread_max = get_setting('max_threads', mode='int') or len(items)
+        pool = get_thread_pool()
         self.queue = [None] * len(items)
-        self._pool = [None] * thread_max
         self._exit = False
-        for x, i in enumerate(items):
-            n = x
-            while n >= thread_max and not mon.abortRequested():  # Hit our thread limit so look for a spare spot in the queue
-                for y, j in enumerate(self._pool):
-                    if j.is_alive():
-                        continue
-                    n = y
-                    break
-                if n >= thread_max:
-                    mon.waitForAbort(0.025)
-            try:
-                self._pool[n] = Thread(target=self._threadwrapper, args=[x, i, func, *args], kwargs=kwargs)
-                self._pool[n].start()
-            except IndexError:
-                kodi_log(f'ParallelThread: INDEX {n} OUT OF RANGE {thread_max}', 1)
+        self.futures = [pool.submit(func, i, *args, **kwargs) for i in items]
 
-    def _threadwrapper(self, x, i, func, *args, **kwargs):
-        self.queue[x] = func(i, *args, **kwargs)
+    def cancel(self):
+        """ Cancel any items that have not started yet """
+        for i in self.futures:
+            i.cancel()
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        for i in self._pool:
-            if self._exit:
+        if exc_type:
+            self.cancel()
+        if self._exit:
+            return
+        mon = Monitor()
+        for i in reversed(self.futures):  # Run items that pool hasn't started in this thread instead of waiting idle
+            if mon.abortRequested():
                 break
+            i.run()
+        for x, i in enumerate(self.futures):
+            while not i.wait(0.1):
+                if mon.abortRequested():
+                    return self.cancel()
+            self.queue[x] = i.result() if not i.exception else None
+
+
+class ThreadFuture():
+    def __init__(self, func, *args, **kwargs):
+        """ Result of a func submitted to ThreadPool
+        Func is only run once by whichever thread claims it first (pool worker or waiting caller)
+        """
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self._lock = Lock()
+        self._event = Event()
+        self._claimed = False
+        self._result = None
+        self.exception = None
+        self.cancelled = False
+
+    def _claim(self):
+        with self._lock:
+            if self._claimed:
+                return False
+            self._claimed = True
+            return True
+
+    def run(self):
+        if not self._claim():
+            return
+        try:
+            self._result = self._func(*self._args, **self._kwargs)
+        except Exception as exc:
+            self.exception = exc
+            kodi_traceback(exc, f'\nlib.addon.thread ThreadFuture {self._func}')
+        finally:
+            self._event.set()
+
+    def cancel(self):
+        if not self._claim():
+            return False
+        self.cancelled = True
+        self._event.set()
+        return True
+
+    def done(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+    def result(self, timeout=None):
+        """ Wait for func and return its result -- raises exception from func if it failed """
+        self._event.wait(timeout)
+        if self.exception:
+            raise self.exception
+        return self._result
+
+
+class ThreadPool():
+    def __init__(self, max_workers):
+        """ Reusable pool of worker threads fed from a work queue
+        Workers are started as needed up to max_workers and exit after being idle for POOL_IDLE_TIMEOUT
+        """
+        self._max_workers = max_workers
+        self._workers = 0
+        self._lock = Lock()
+        self._queue = Queue()
+
+    def submit(self, func, *args, **kwargs):
+        future = ThreadFuture(func, *args, **kwargs)
+        self._queue.put(future)
+        with self._lock:
+            if self._workers < self._max_workers:
+                self._workers += 1
+                Thread(target=self._worker, daemon=True).start()
+        return future
+
+    def _worker(self):
+        mon = Monitor()
+        while True:
             try:
-                i.join()
-            except AttributeError:  # is None
-                pass
+                future = self._queue.get(timeout=POOL_IDLE_TIMEOUT)
+            except Empty:
+                with self._lock:
+                    if not self._queue.empty():  # Work was submitted while timing out so keep going
+                        continue
+                    self._workers -= 1
+                    return
+            if mon.abortRequested():
+                future.cancel()
+                continue
+            future.run()
+
+
+_thread_pool = None
+_thread_pool_lock = Lock()
+
+
+def get_thread_pool():
+    """ Get process-wide ThreadPool -- created on first use and sized from max_threads setting """
+    global _thread_pool
+    with _thread_pool_lock:
+        if not _thread_pool:
+            _thread_pool = ThreadPool(get_setting('max_threads', mode='int') or POOL_DEFAULT_THREADS)
+        return _thread_pool
+
@@ -1,4 +1,6 @@
 from xbmc import Monitor
+from threading import Lock, local
+from contextlib import contextmanager
 from xbmcgui import Window, getCurrentWindowId
 from tmdbhelper.parser import try_type, try_int
 from resources.lib.addon.plugin import executebuiltin, get_condvisibility, get_infolabel
@@ -19,6 +21,64 @@ def get_property(name, set_property=None, clear_property=False, window_id=None,
     return try_type(ret_property, is_type or str)
 
 
+class PropertyWriter(object):
+    """
+    Publishes TMDbHelper.{prefix}.{key} properties through one Window handle
+    Keeps a shadow of last published values so unchanged keys are not written again
+    Keys in external are written by other code (e.g. ImageFunctions) so are always written through
+    """
+    def __init__(self, prefix, window_id=10000, external=None):
+        self.prefix = f'TMDbHelper.{prefix}'
+        self.external = external or set()
+        self._window = Window(window_id)
+        self._shadow = {}  # key: last published value with None for cleared
+        self._lock = Lock()
+        self._local = local()
+
+    @contextmanager
+    def batch(self):
+        """ Collect writes made in this thread and publish them together on exit """
+        if getattr(self._local, 'batch', None) is not None:  # Already batching so outer batch publishes
+            yield
+            return
+        self._local.batch = {}
+        try:
+            yield
+        finally:
+            properties, self._local.batch = self._local.batch, None
+            self._publish(properties)
+
+    def _publish(self, properties):
+        with self._lock:
+            for k, v in properties.items():
+                if k not in self.external and k in self._shadow and self._shadow[k] == v:
+                    continue
+                if v is None:
+                    self._window.clearProperty(f'{self.prefix}.{k}')
+                else:
+                    self._window.setProperty(f'{self.prefix}.{k}', v)
+                self._shadow[k] = v
+
+    def set_many(self, properties):
+        """ Publish dict of {key: value}. None value clears property """
+        properties = {k: None if v is None else f'{v}' for k, v in properties.items()}
+        batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            return batch.update(properties)
+        self._publish(properties)
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def clear_many(self, keys):
+        self.set_many(dict.fromkeys(keys))
+
+    def reset(self):
+        """ Forget published values so next writes go to the window again """
+        with self._lock:
+            self._shadow = {}
+
+
 def _property_is_value(name, value):
     if not value and not get_property(name):
         return True
@@ -1,6 +1,6 @@
 from xbmc import Monitor, executeJSONRPC
 from resources.lib.addon.logger import kodi_log
-from tmdbhelper.parser import try_int, find_dict_in_list
+from tmdbhelper.parser import try_int
 from resources.lib.api.kodi.mapping import ItemMapper
 from resources.lib.files.mcache import MemoryCache
 from resources.lib.addon.thread import use_thread_lock
@@ -12,6 +12,9 @@ from xbmcvfs import Stat
 """
 
 
+JSONRPC_BATCH_SIZE = 50  # Number of queries sent in each batch request
+
+
 def get_jsonrpc(method=None, params=None, query_id=1):
     if not method:
         return {}
@@ -31,6 +34,28 @@ def get_jsonrpc(method=None, params=None, query_id=1):
     return response
 
 
+def get_jsonrpc_batch(queries, batch_size=JSONRPC_BATCH_SIZE):
+    """
+    Send list of (method, params) queries as JSON-RPC batch requests
+    Returns list of responses in same order as queries with empty dict for any query that failed
+    """
+    from json import dumps, loads
+    responses = []
+    for x in range(0, len(queries), batch_size):
+        batch = [
+            {"jsonrpc": "2.0", "method": method, "params": params, "id": x + y} if params else
+            {"jsonrpc": "2.0", "method": method, "id": x + y}
+            for y, (method, params) in enumerate(queries[x:x + batch_size])]
+        try:
+            response = loads(executeJSONRPC(dumps(batch)))
+            response = {i['id']: i for i in response} if isinstance(response, list) else {}
+        except Exception as exc:
+            kodi_log(f'TMDbHelper - JSONRPC Batch Error:\n{exc}', 1)
+            response = {}
+        responses += [response.get(i['id'], {}) for i in batch]
+    return responses
+
+
 def get_kodi_library(tmdb_type, tvshowid=None):
     if tmdb_type == 'movie':
         return KodiLibrary(dbtype='movie')
@@ -137,66 +162,190 @@ def get_directory(url):
         return [{}]
 
 
+DETAILS_METHODS = {
+    'movie': 'VideoLibrary.GetMovieDetails',
+    'tvshow': 'VideoLibrary.GetTVShowDetails',
+    'season': 'VideoLibrary.GetSeasonDetails',
+    'episode': 'VideoLibrary.GetEpisodeDetails'}
+DETAILS_PROPERTIES = {
+    'movie': [
+        "title", "genre", "year", "rating", "director", "trailer", "tagline", "plot", "plotoutline", "originaltitle",
+        "lastplayed", "playcount", "writer", "studio", "mpaa", "cast", "country", "imdbnumber", "runtime", "set",
+        "showlink", "streamdetails", "top250", "votes", "fanart", "thumbnail", "file", "sorttitle", "resume", "setid",
+        "dateadded", "tag", "art", "userrating", "ratings", "premiered", "uniqueid"],
+    'tvshow': [
+        "title", "genre", "year", "rating", "plot", "studio", "mpaa", "cast", "playcount", "episode", "imdbnumber",
+        "premiered", "votes", "lastplayed", "fanart", "thumbnail", "file", "originaltitle", "sorttitle", "episodeguide",
+        "season", "watchedepisodes", "dateadded", "tag", "art", "userrating", "ratings", "runtime", "uniqueid"],
+    'season': [
+        "season", "showtitle", "playcount", "episode", "fanart", "thumbnail", "tvshowid", "watchedepisodes",
+        "art", "userrating", "title"],
+    'episode': [
+        "title", "plot", "votes", "rating", "writer", "firstaired", "playcount", "runtime", "director", "productioncode",
+        "season", "episode", "originaltitle", "showtitle", "cast", "streamdetails", "lastplayed", "fanart", "thumbnail",
+        "file", "resume", "tvshowid", "dateadded", "uniqueid", "art", "specialsortseason", "specialsortepisode", "userrating",
+        "seasonid", "ratings"]}
+
+
+def _map_item_details(response, dbid, key):
+    try:
+        details = response['result'][f'{key}details']
+        details['dbid'] = dbid
+        return ItemMapper(key=key).get_info(details)
+    except (AttributeError, KeyError, TypeError):
+        return {}
+
+
 def _get_item_details(dbid=None, method=None, key=None, properties=None):
     if not dbid or not method or not key or not properties:
         return {}
     params = {
         f'{key}id': try_int(dbid),
         "properties": properties}
-    try:
-        details = get_jsonrpc(method, params)
-        details = details['result'][f'{key}details']
-        details['dbid'] = dbid
-        return ItemMapper(key=key).get_info(details)
-    except (AttributeError, KeyError):
+    return _map_item_details(get_jsonrpc(method, params), dbid, key)
+
+
+def get_item_details_batch(key, dbids):
+    """ Get details for multiple dbids of same type in batched JSON-RPC calls. Returns dict of {dbid: details} """
+    dbids = [i for i in dbids if i]
+    if not dbids or key not in DETAILS_METHODS:
         return {}
+    queries = [(DETAILS_METHODS[key], {f'{key}id': try_int(i), "properties": DETAILS_PROPERTIES[key]}) for i in dbids]
+    responses = get_jsonrpc_batch(queries)
+    return {dbid: _map_item_details(response, dbid, key) for dbid, response in zip(dbids, responses)}
 
 
 def get_movie_details(dbid=None):
-    properties = [
-        "title", "genre", "year", "rating", "director", "trailer", "tagline", "plot", "plotoutline", "originaltitle",
-        "lastplayed", "playcount", "writer", "studio", "mpaa", "cast", "country", "imdbnumber", "runtime", "set",
-        "showlink", "streamdetails", "top250", "votes", "fanart", "thumbnail", "file", "sorttitle", "resume", "setid",
-        "dateadded", "tag", "art", "userrating", "ratings", "premiered", "uniqueid"]
-    return _get_item_details(dbid=dbid, method="VideoLibrary.GetMovieDetails", key="movie", properties=properties)
+    return _get_item_details(dbid=dbid, method=DETAILS_METHODS['movie'], key="movie", properties=DETAILS_PROPERTIES['movie'])
 
 
 def get_tvshow_details(dbid=None):
-    properties = [
-        "title", "genre", "year", "rating", "plot", "studio", "mpaa", "cast", "playcount", "episode", "imdbnumber",
-        "premiered", "votes", "lastplayed", "fanart", "thumbnail", "file", "originaltitle", "sorttitle", "episodeguide",
-        "season", "watchedepisodes", "dateadded", "tag", "art", "userrating", "ratings", "runtime", "uniqueid"]
-    return _get_item_details(dbid=dbid, method="VideoLibrary.GetTVShowDetails", key="tvshow", properties=properties)
+    return _get_item_details(dbid=dbid, method=DETAILS_METHODS['tvshow'], key="tvshow", properties=DETAILS_PROPERTIES['tvshow'])
 
 
 def get_season_details(dbid=None):
-    properties = [
-        "season", "showtitle", "playcount", "episode", "fanart", "thumbnail", "tvshowid", "watchedepisodes",
-        "art", "userrating", "title"]
-    return _get_item_details(dbid=dbid, method="VideoLibrary.GetSeasonDetails", key="season", properties=properties)
+    return _get_item_details(dbid=dbid, method=DETAILS_METHODS['season'], key="season", properties=DETAILS_PROPERTIES['season'])
 
 
 def get_episode_details(dbid=None):
-    properties = [
-        "title", "plot", "votes", "rating", "writer", "firstaired", "playcount", "runtime", "director", "productioncode",
-        "season", "episode", "originaltitle", "showtitle", "cast", "streamdetails", "lastplayed", "fanart", "thumbnail",
-        "file", "resume", "tvshowid", "dateadded", "uniqueid", "art", "specialsortseason", "specialsortepisode", "userrating",
-        "seasonid", "ratings"]
-    return _get_item_details(dbid=dbid, method="VideoLibrary.GetEpisodeDetails", key="episode", properties=properties)
+    return _get_item_details(dbid=dbid, method=DETAILS_METHODS['episode'], key="episode", properties=DETAILS_PROPERTIES['episode'])
 
 
 THREAD_LOCK = 'TMDbHelper.KodiLibrary.ThreadLock'
 
 
+DATABASE_INDEX_KEYS = ('dbid', 'season', 'imdb_id', 'tmdb_id', 'tvdb_id', 'originaltitle', 'title')
+
+
+def get_database_index(database, keys=DATABASE_INDEX_KEYS):
+    """ Map {key: {value: [list_index, ...]}} so lookups are hashed instead of scanning database for each key """
+    index = {k: {} for k in keys}
+    for x, i in enumerate(database or []):
+        for k in keys:
+            v = i.get(k)
+            if v is None:
+                continue
+            try:
+                index[k].setdefault(v, []).append(x)
+            except TypeError:  # Unhashable value cannot be looked up
+                continue
+    return index
+
+
+LIBRARY_METHODS = {'movie': 'Movie', 'tvshow': 'TVShow', 'season': 'Season', 'episode': 'Episode'}
+LIBRARY_PROPERTIES = {
+    'movie': ["title", "imdbnumber", "originaltitle", "uniqueid", "year", "file"],
+    'tvshow': ["title", "imdbnumber", "originaltitle", "uniqueid", "year"],
+    'season': ["title", "showtitle", "season"],
+    'episode': ["title", "showtitle", "season", "episode", "file"]}
+
+
+def get_library_item(item, dbtype):
+    """ Map JSON-RPC library item to the dictionary stored in KodiLibrary.database """
+    return {
+        'imdb_id': item.get('uniqueid', {}).get('imdb'),
+        'tmdb_id': item.get('uniqueid', {}).get('tmdb'),
+        'tvdb_id': item.get('uniqueid', {}).get('tvdb'),
+        'dbid': item.get(f'{dbtype}id'),
+        'title': item.get('title'),
+        'originaltitle': item.get('originaltitle'),
+        'showtitle': item.get('showtitle'),
+        'season': item.get('season'),
+        'episode': item.get('episode'),
+        'year': item.get('year'),
+        'file': item.get('file')}
+
+
+def get_library_item_details(dbid, dbtype):
+    """ Get single library item in KodiLibrary.database format """
+    method = f'VideoLibrary.Get{LIBRARY_METHODS[dbtype]}Details'
+    params = {f'{dbtype}id': try_int(dbid), "properties": LIBRARY_PROPERTIES[dbtype]}
+    try:
+        details = get_jsonrpc(method, params)['result'][f'{dbtype}details']
+    except (KeyError, AttributeError, TypeError):
+        return
+    details.setdefault(f'{dbtype}id', try_int(dbid))
+    return get_library_item(details, dbtype)
+
+
+def get_library_items(dbtype=None, tvshowid=None):
+    """ Get all library items of dbtype in KodiLibrary.database format """
+    if dbtype not in LIBRARY_PROPERTIES:
+        return
+    method = f'VideoLibrary.Get{LIBRARY_METHODS[dbtype]}s'
+    params = {"properties": LIBRARY_PROPERTIES[dbtype]}
+    if dbtype in ('season', 'episode'):
+        params['tvshowid'] = tvshowid
+    try:
+        response = get_jsonrpc(method, params)['result'][f'{dbtype}s'] or []
+    except (KeyError, AttributeError):
+        return []
+    return [get_library_item(item, dbtype) for item in response]
+
+
+def get_library_items_batch(dbtype, tvshowids):
+    """ Get season or episode library items for multiple tvshowids in batched calls. Returns dict of {tvshowid: items} """
+    tvshowids = [i for i in tvshowids if i]
+    if dbtype not in ('season', 'episode') or not tvshowids:
+        return {}
+    method = f'VideoLibrary.Get{LIBRARY_METHODS[dbtype]}s'
+    queries = [(method, {"tvshowid": try_int(i), "properties": LIBRARY_PROPERTIES[dbtype]}) for i in tvshowids]
+    responses = get_jsonrpc_batch(queries)
+    return {
+        tvshowid: [get_library_item(item, dbtype) for item in response.get('result', {}).get(f'{dbtype}s') or []]
+        for tvshowid, response in zip(tvshowids, responses)}
+
+
+def get_library_database(dbtype, tvshowid=None, attempt_reconnect=False, logging=True):
+    retries = 5 if attempt_reconnect else 1
+    while not Monitor().abortRequested() and retries > 0:
+        database = get_library_items(dbtype, tvshowid)
+        if database:
+            return database
+        Monitor().waitForAbort(1)
+        retries -= 1
+    if logging:
+        kodi_log(f'Getting KodiDB {dbtype} FAILED!', 1)
+
+
 class KodiLibrary(object):
-    def __init__(self, dbtype=None, tvshowid=None, attempt_reconnect=False, logging=True, cache_refresh=False):
+    def __init__(self, dbtype=None, tvshowid=None, attempt_reconnect=False, logging=True, cache_refresh=False, database=None):
         self.dbtype = dbtype
         self._cache = MemoryCache(name='KodiLibrary_{dbtype}_{tvshowid}')
+        if database is not None:  # Database already retrieved by caller e.g. via get_library_items_batch()
+            self.database, self.database_index = database, get_database_index(database)
+            return
         self._get_database(dbtype, tvshowid, attempt_reconnect, logging, cache_refresh)
 
     @use_thread_lock(THREAD_LOCK)
     def _get_database(self, dbtype, tvshowid=None, attempt_reconnect=False, logging=True, cache_refresh=False):
 
+        def _get_snapshot():
+            if cache_refresh:
+                return
+            from resources.lib.api.kodi.snapshot import get_snapshot
+            return get_snapshot(dbtype)
+
         def _get_db():
             if dbtype == 'both':
                 movies = self._cache.use(
@@ -210,54 +359,25 @@ class KodiLibrary(object):
                 self.get_database, dbtype, tvshowid, attempt_reconnect,
                 cache_name='database', cache_minutes=180, cache_refresh=cache_refresh)
 
+        snapshot = _get_snapshot()  # Service keeps a library snapshot for movies and tvshows current from notifications
+        if snapshot:
+            self.database, self.database_index = snapshot
+            return self.database
+
         self.database = _get_db()
+        self.database_index = get_database_index(self.database)
 
         return self.database
 
-    def get_database(self, dbtype, tvshowid=None, attempt_reconnect=False, logging=True):
-        retries = 5 if attempt_reconnect else 1
-        while not Monitor().abortRequested() and retries > 0:
-            database = self._get_kodi_db(dbtype, tvshowid)
-            if database:
-                return database
-            Monitor().waitForAbort(1)
-            retries -= 1
-        if logging:
-            kodi_log(f'Getting KodiDB {dbtype} FAILED!', 1)
-
-    def _get_kodi_db(self, dbtype=None, tvshowid=None):
-        if not dbtype:
-            return
-        if dbtype == "movie":
-            method = "VideoLibrary.GetMovies"
-            params = {"properties": ["title", "imdbnumber", "originaltitle", "uniqueid", "year", "file"]}
-        if dbtype == "tvshow":
-            method = "VideoLibrary.GetTVShows"
-            params = {"properties": ["title", "imdbnumber", "originaltitle", "uniqueid", "year"]}
-        if dbtype == "season":
-            method = "VideoLibrary.GetSeasons"
-            params = {"tvshowid": tvshowid, "properties": ["title", "showtitle", "season"]}
-        if dbtype == "episode":
-            method = "VideoLibrary.GetEpisodes"
-            params = {"tvshowid": tvshowid, "properties": ["title", "showtitle", "season", "episode", "file"]}
+    def find_index_list(self, key, value):
+        """ Returns list indices of items in database where item[key] == value -- same as find_dict_in_list() """
         try:
-            response = get_jsonrpc(method, params)['result'][f'{dbtype}s'] or []
-        except (KeyError, AttributeError):
+            return self.database_index[key].get(value) or []
+        except TypeError:
             return []
-        dbid_name = f'{dbtype}id'
-        return [{
-            'imdb_id': item.get('uniqueid', {}).get('imdb'),
-            'tmdb_id': item.get('uniqueid', {}).get('tmdb'),
-            'tvdb_id': item.get('uniqueid', {}).get('tvdb'),
-            'dbid': item.get(dbid_name),
-            'title': item.get('title'),
-            'originaltitle': item.get('originaltitle'),
-            'showtitle': item.get('showtitle'),
-            'season': item.get('season'),
-            'episode': item.get('episode'),
-            'year': item.get('year'),
-            'file': item.get('file')}
-            for item in response]
+
+    def get_database(self, dbtype, tvshowid=None, attempt_reconnect=False, logging=True):
+        return get_library_database(dbtype, tvshowid, attempt_reconnect, logging)
 
     def get_info(
             self, info, dbid=None, imdb_id=None, originaltitle=None, title=None, year=None, season=None,
@@ -265,21 +385,21 @@ class KodiLibrary(object):
         if not self.database or not info:
             return
         yearcheck = False
-        index_list = find_dict_in_list(self.database, 'dbid', dbid) if dbid else []
+        index_list = self.find_index_list('dbid', dbid) if dbid else []
         if not index_list and season:
-            index_list = find_dict_in_list(self.database, 'season', try_int(season))
+            index_list = self.find_index_list('season', try_int(season))
         if not index_list and imdb_id:
-            index_list = find_dict_in_list(self.database, 'imdb_id', imdb_id)
+            index_list = self.find_index_list('imdb_id', imdb_id)
         if not index_list and tmdb_id:
-            index_list = find_dict_in_list(self.database, 'tmdb_id', str(tmdb_id))
+            index_list = self.find_index_list('tmdb_id', str(tmdb_id))
         if not index_list and tvdb_id:
-            index_list = find_dict_in_list(self.database, 'tvdb_id', str(tvdb_id))
+            index_list = self.find_index_list('tvdb_id', str(tvdb_id))
         if not index_list:
             yearcheck = str(year) or 'dummynull'  # Also use year if matching by title to be certain we have correct item. Dummy value for True value that will always fail comparison check.
         if not index_list and originaltitle:
-            index_list = find_dict_in_list(self.database, 'originaltitle', originaltitle)
+            index_list = self.find_index_list('originaltitle', originaltitle)
         if not index_list and title:
-            index_list = find_dict_in_list(self.database, 'title', title)
+            index_list = self.find_index_list('title', title)
         for i in index_list:
             if season and episode:
                 if try_int(episode) == self.database[i].get('episode'):
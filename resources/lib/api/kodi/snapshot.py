@@ -0,0 +1,150 @@
+import os
+import pickle
+from threading import Lock
+from resources.lib.addon.window import get_property
+from resources.lib.addon.logger import kodi_log
+from resources.lib.files.futils import get_file_path
+from resources.lib.api.kodi.rpc import get_library_item_details, get_library_database, get_database_index
+
+""" Lazyimports
+from time import time
+from xbmc import Monitor
+"""
+
+
+SNAPSHOT_VERSION = 1  # Increment if format of snapshot file changes
+SNAPSHOT_FOLDER = 'kodi_library'
+SNAPSHOT_DBTYPES = ('movie', 'tvshow')
+PICKLE_PROTOCOL = min(5, pickle.HIGHEST_PROTOCOL)
+SNAPSHOT_REFRESH_PROPERTY = 'KodiLibrary.Refresh'  # Set by other processes to ask LibraryMonitor to refresh its snapshots
+SNAPSHOT_REFRESH_TIMEOUT = 60  # Seconds to wait for LibraryMonitor to finish refresh
+
+_snapshots = {}  # dbtype: (revision, (database, database_index)) -- loaded snapshots reused within process
+_snapshots_lock = Lock()
+
+
+def _get_revision_property(dbtype):
+    return f'KodiLibrary.{dbtype}.Revision'
+
+
+def _get_snapshot_path(dbtype, make_dir=False):
+    return get_file_path(SNAPSHOT_FOLDER, f'{dbtype}.pickle', make_dir=make_dir)
+
+
+def _load_snapshot(dbtype, revision):
+    try:
+        with open(_get_snapshot_path(dbtype), 'rb') as f:
+            data = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+        return
+    if data.get('version') != SNAPSHOT_VERSION or data.get('revision') != revision:
+        return  # Snapshot file was replaced after revision property was read so it will be picked up next time
+    database = data.get('database') or []
+    return (database, get_database_index(database))
+
+
+def get_snapshot(dbtype):
+    """
+    Get (database, database_index) for dbtype from library snapshot maintained by service
+    Returns None if service has not published a snapshot so caller should query library itself
+    """
+    if dbtype == 'both':
+        movies, tvshows = get_snapshot('movie'), get_snapshot('tvshow')
+        if not movies or not tvshows:
+            return
+        revision = f'{_snapshots["movie"][0]}|{_snapshots["tvshow"][0]}'
+        with _snapshots_lock:
+            if _snapshots.get('both', (None, ))[0] != revision:
+                database = movies[0] + tvshows[0]
+                _snapshots['both'] = (revision, (database, get_database_index(database)))
+            return _snapshots['both'][1]
+
+    if dbtype not in SNAPSHOT_DBTYPES:
+        return
+    revision = get_property(_get_revision_property(dbtype))
+    if not revision:
+        return
+
+    with _snapshots_lock:
+        try:
+            cached_revision, snapshot = _snapshots[dbtype]
+            if cached_revision == revision:
+                return snapshot
+        except KeyError:
+            pass
+        snapshot = _load_snapshot(dbtype, revision)
+        if snapshot:
+            _snapshots[dbtype] = (revision, snapshot)
+        return snapshot
+
+
+def request_refresh(timeout=SNAPSHOT_REFRESH_TIMEOUT):
+    """
+    Ask LibraryMonitor in service to refresh snapshots it owns and wait for it to finish
+    Snapshots must not be written from other processes because service would overwrite them from its own items
+    Returns False if service is not maintaining snapshots or did not finish before timeout
+    """
+    if not any(get_property(_get_revision_property(i)) for i in SNAPSHOT_DBTYPES):
+        return False
+    from xbmc import Monitor
+    get_property(SNAPSHOT_REFRESH_PROPERTY, set_property='True')
+    monitor = Monitor()
+    for _ in range(timeout * 10):
+        if not get_property(SNAPSHOT_REFRESH_PROPERTY):
+            return True
+        if monitor.waitForAbort(0.1):
+            break
+    return False
+
+
+class LibrarySnapshot(object):
+    """ Persistent copy of KodiLibrary database for dbtype which can be updated per dbid """
+    def __init__(self, dbtype):
+        self.dbtype = dbtype
+        self.items = {}  # dbid: item
+        self.revision = None
+
+    def refresh(self):
+        """ Replace snapshot with full library query """
+        database = get_library_database(self.dbtype, attempt_reconnect=True)
+        if database is None:
+            return False
+        self.items = {i['dbid']: i for i in database}
+        return self.save()
+
+    def update(self, dbid):
+        """ Update single item in snapshot. Returns True if changed """
+        item = get_library_item_details(dbid, self.dbtype)
+        if not item:
+            return self.remove(dbid)
+        if self.items.get(item['dbid']) == item:
+            return False
+        self.items[item['dbid']] = item
+        return True
+
+    def remove(self, dbid):
+        """ Remove single item from snapshot. Returns True if changed """
+        return self.items.pop(dbid, None) is not None
+
+    def save(self):
+        """ Write snapshot file then publish new revision so other processes reload it """
+        from time import time
+        self.revision = f'{time():.6f}'
+        data = {
+            'version': SNAPSHOT_VERSION,
+            'revision': self.revision,
+            'dbtype': self.dbtype,
+            'database': list(self.items.values())}
+        path = _get_snapshot_path(self.dbtype, make_dir=True)
+        try:
+            with open(f'{path}.tmp', 'wb') as f:
+                pickle.dump(data, f, protocol=PICKLE_PROTOCOL)
+            os.replace(f'{path}.tmp', path)
+        except OSError as exc:
+            kodi_log(f'KodiLibrary snapshot {self.dbtype} write FAILED!\n{exc}', 1)
+            return False
+        get_property(_get_revision_property(self.dbtype), set_property=self.revision)
+        return True
+
+    def clear(self):
+        get_property(_get_revision_property(self.dbtype), clear_property=True)
@@ -1,6 +1,9 @@
 from xbmcgui import Dialog
+from threading import Lock, BoundedSemaphore
+from xbmc import Monitor
+from urllib.parse import urlparse
 from resources.lib.addon.window import get_property
-from resources.lib.addon.plugin import get_localized, get_condvisibility
+from resources.lib.addon.plugin import get_localized, get_condvisibility, get_setting
 from tmdbhelper.parser import try_int
 from resources.lib.addon.tmdate import get_timestamp, set_timestamp
 from resources.lib.files.bcache import BasicCache
@@ -12,8 +15,12 @@ import xml.etree.ElementTree as ET
 from copy import copy
 from json import dumps
 import requests
+from requests.adapters import HTTPAdapter
 """
 
+DEFAULT_POOL_SIZE = 20  # Connections kept alive per host when max_threads setting is unlimited
+MAX_RETRY_AFTER = 10  # Max seconds to wait and retry after 429 Too Many Requests before suppressing requests
+
 
 def translate_xml(request):
     def dictify(r, root=True):
@@ -40,6 +47,33 @@ def json_loads(obj):
     return loads(obj)
 
 
+_sessions = {}
+_sessions_lock = Lock()
+
+
+def get_session(url):
+    """ Get shared requests.Session and BoundedSemaphore for host of url
+    Sessions keep connections alive so that TCP/TLS handshakes are reused across requests and ParallelThread workers
+    Semaphore limits concurrent requests per host to the size of the connection pool
+    """
+    host = urlparse(url).netloc
+    with _sessions_lock:
+        try:
+            return _sessions[host]
+        except KeyError:
+            pass
+        import requests
+        from requests.adapters import HTTPAdapter
+        pool_size = get_setting('max_threads', 'int') or DEFAULT_POOL_SIZE
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session = requests.Session()
+        session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _sessions[host] = (session, BoundedSemaphore(pool_size))
+        return _sessions[host]
+
+
 class RequestAPI(object):
     def __init__(self, req_api_url=None, req_api_key=None, req_api_name=None, timeout=None, error_notification=True):
         self.req_api_url = req_api_url or ''
@@ -126,15 +160,17 @@ class RequestAPI(object):
     def get_simple_api_request(self, request=None, postdata=None, headers=None, method=None):
         import requests
         try:
-            if method == 'delete':
-                return requests.delete(request, headers=headers, timeout=self.timeout)
-            if method == 'put':
-                return requests.put(request, data=postdata, headers=headers, timeout=self.timeout)
-            if method == 'json':
-                return requests.post(request, json=postdata, headers=headers, timeout=self.timeout)
-            if postdata or method == 'post':  # If pass postdata assume we want to post
-                return requests.post(request, data=postdata, headers=headers, timeout=self.timeout)
-            return requests.get(request, headers=headers, timeout=self.timeout)
+            session, semaphore = get_session(request)
+            with semaphore:
+                if method == 'delete':
+                    return session.delete(request, headers=headers, timeout=self.timeout)
+                if method == 'put':
+                    return session.put(request, data=postdata, headers=headers, timeout=self.timeout)
+                if method == 'json':
+                    return session.post(request, json=postdata, headers=headers, timeout=self.timeout)
+                if postdata or method == 'post':  # If pass postdata assume we want to post
+                    return session.post(request, data=postdata, headers=headers, timeout=self.timeout)
+                return session.get(request, headers=headers, timeout=self.timeout)
         except requests.exceptions.ConnectionError as errc:
             self.connection_error(errc, check_status=True)
         except requests.exceptions.Timeout as errt:
@@ -142,7 +178,17 @@ class RequestAPI(object):
         except Exception as err:
             kodi_log(f'RequestError: {err}', 1)
 
-    def get_api_request(self, request=None, postdata=None, headers=None, method=None):
+    def too_many_requests(self, response):
+        """ Wait for Retry-After seconds if short enough and return True to retry request
+        Otherwise suppress requests for Retry-After seconds (or 30 seconds if not given)
+        """
+        retry_after = try_int(response.headers.get('Retry-After'))
+        if 0 < retry_after <= MAX_RETRY_AFTER:
+            kodi_log(f'HTTP Error Code: 429\nRetrying {self.req_api_name} after {retry_after} seconds', 1)
+            return not Monitor().waitForAbort(retry_after)
+        self.connection_error(429, wait_time=retry_after or 30)
+
+    def get_api_request(self, request=None, postdata=None, headers=None, method=None, retry_429=True):
         """
         Make the request to the API by passing a url request string
         """
@@ -163,9 +209,12 @@ class RequestAPI(object):
             # In this case let's set a connection error and suppress retries for a minute
             if response.status_code == 500:
                 self.fivehundred_error(request)
-            # 429 is too many requests code so suppress retries for a minute
+            # 429 is too many requests code so back-off and retry once or suppress retries
             elif response.status_code == 429:
-                self.connection_error(429)
+                if not retry_429:
+                    self.connection_error(429)
+                elif self.too_many_requests(response):
+                    return self.get_api_request(request, postdata, headers, method, retry_429=False)
             # Don't write 400 Bad Request error to log
             # 401 == OAuth / API key required
             elif try_int(response.status_code) > 400:
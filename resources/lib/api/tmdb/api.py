@@ -4,16 +4,17 @@ from resources.lib.addon.consts import TMDB_ALL_ITEMS_LISTS, TMDB_PARAMS_SEASONS
 from tmdbhelper.parser import try_int
 from resources.lib.addon.window import get_property
 from resources.lib.addon.tmdate import format_date
-from resources.lib.files.futils import use_json_filecache, validify_filename
+from resources.lib.files.futils import validify_filename
 from resources.lib.items.pages import PaginatedItems
 from resources.lib.api.request import RequestAPI
 from resources.lib.api.tmdb.mapping import ItemMapper, get_episode_to_air
+from resources.lib.api.tmdb.ids import TMDbIdIndex
 from urllib.parse import quote_plus
 
 """ Lazyimports
 from resources.lib.items.listitem import ListItem
-from resources.lib.files.downloader import Downloader
 from resources.lib.addon.tmdate import get_datetime_now, get_timedelta
+from resources.lib.addon.thread import ParallelThread
 """
 
 ARTWORK_QUALITY = get_setting('artwork_quality', 'int')
@@ -41,7 +42,15 @@ class TMDb(RequestAPI):
         self.mpaa_prefix = mpaa_prefix
         self.append_to_response = APPEND_TO_RESPONSE
         self.req_strip += [(self.append_to_response, ''), (self.req_language, f'{self.iso_language}{"_en" if ARTLANG_FALLBACK else ""}')]
-        self.mapper = ItemMapper(self.language, self.mpaa_prefix)
+        self._mapper = None
+        self.tmdb_ids = TMDbIdIndex(self._cache)
+
+    @property
+    def mapper(self):
+        """ ItemMapper builds large mapping tables so only construct when first needed """
+        if self._mapper is None:
+            self._mapper = ItemMapper(self.language, self.mpaa_prefix)
+        return self._mapper
 
     def get_url_separator(self, separator=None):
         if separator == 'AND':
@@ -85,15 +94,50 @@ class TMDb(RequestAPI):
         return self._cache.use_cache(
             self._get_tmdb_multisearch, query=query, validfy=validfy, media_type=media_type, **kwargs)
 
-    def get_tmdb_id(self, tmdb_type=None, imdb_id=None, tvdb_id=None, query=None, year=None, episode_year=None, raw_data=False, **kwargs):
+    def get_tmdb_id(self, tmdb_type=None, imdb_id=None, tvdb_id=None, query=None, year=None, episode_year=None, raw_data=False, trakt_id=None, **kwargs):
         if not tmdb_type:
             return
+        if not raw_data:
+            tmdb_id = self.tmdb_ids.get_tmdb_id(tmdb_type, imdb_id=imdb_id, tvdb_id=tvdb_id, trakt_id=trakt_id, query=query, year=year)
+            if tmdb_id:
+                return tmdb_id
+        return self._get_tmdb_id_cached(tmdb_type, imdb_id, tvdb_id, query, year, episode_year, raw_data, **kwargs)
+
+    def get_tmdb_id_list(self, items):
+        """ Get tmdb_id for each dict of get_tmdb_id kwargs in items. Returns list of tmdb_ids in same order
+        Items with tmdb_id already set are passed through. Ids are looked up in local index in one query
+        and only the misses are resolved from TMDb in parallel
+        """
+        from resources.lib.addon.thread import ParallelThread
+        tmdb_ids = [i.get('tmdb_id') for i in items]
+        lookups = [x for x, i in enumerate(items) if not tmdb_ids[x] and i.get('tmdb_type')]
+        for x, tmdb_id in zip(lookups, self.tmdb_ids.get_tmdb_ids([items[x] for x in lookups])):
+            tmdb_ids[x] = tmdb_id
+        misses = [x for x in lookups if not tmdb_ids[x]]
+        if not misses:
+            return tmdb_ids
+
+        def _get_tmdb_id(x):
+            i = items[x]
+            return self._get_tmdb_id_cached(
+                i['tmdb_type'], i.get('imdb_id'), i.get('tvdb_id'), i.get('query'), i.get('year'), i.get('episode_year'), False)
+
+        with ParallelThread(misses, _get_tmdb_id) as pt:
+            item_queue = pt.queue
+        for x, tmdb_id in zip(misses, item_queue):
+            tmdb_ids[x] = tmdb_id
+        return tmdb_ids
+
+    def _get_tmdb_id_cached(self, tmdb_type, imdb_id, tvdb_id, query, year, episode_year, raw_data, **kwargs):
         kwargs['cache_days'] = CACHE_MEDIUM
         kwargs['cache_name'] = 'TMDb.get_tmdb_id.v3'
         kwargs['cache_combine_name'] = True
-        return self._cache.use_cache(
+        tmdb_id = self._cache.use_cache(
             self._get_tmdb_id, tmdb_type=tmdb_type, imdb_id=imdb_id, tvdb_id=tvdb_id, query=query, year=year,
             episode_year=episode_year, raw_data=raw_data, **kwargs)
+        if tmdb_id and not raw_data and (imdb_id or tvdb_id):
+            self.tmdb_ids.set_ids(tmdb_type, tmdb_id, imdb_id=imdb_id, tvdb_id=tvdb_id)
+        return tmdb_id
 
     def _get_tmdb_id(self, tmdb_type, imdb_id, tvdb_id, query, year, episode_year, raw_data, **kwargs):
         func = self.get_request_lc
@@ -200,8 +244,16 @@ class TMDb(RequestAPI):
             path_affix += ['season', season]
         if season is not None and episode is not None:
             path_affix += ['episode', episode]
-        return self.get_request_lc(
-            tmdb_type, tmdb_id, *path_affix, append_to_response=self.append_to_response, cache_refresh=cache_refresh) or {}
+        if path_affix or cache_refresh:
+            return self.get_request_lc(
+                tmdb_type, tmdb_id, *path_affix, append_to_response=self.append_to_response, cache_refresh=cache_refresh) or {}
+        details = self.get_request_lc(tmdb_type, tmdb_id, append_to_response=self.append_to_response, cache_only=True)
+        if details:
+            return details
+        # Only index ids when details are fetched so that cached lookups don't write to the cache
+        details = self.get_request_lc(tmdb_type, tmdb_id, append_to_response=self.append_to_response) or {}
+        self.tmdb_ids.set_details(tmdb_type, details)
+        return details
 
     def get_details(self, tmdb_type, tmdb_id, season=None, episode=None, **kwargs):
         info_item = self.get_details_request(tmdb_type, tmdb_id)
@@ -420,44 +472,31 @@ class TMDb(RequestAPI):
             i['label2'] = i['infoproperties'].get('role')
         return items
 
-    def _get_downloaded_list(self, export_list, sorting=None, reverse=False, datestamp=None):
-        from resources.lib.files.downloader import Downloader
-        if not export_list or not datestamp:
-            return
-        from json import loads as json_loads
-        download_url = f'https://files.tmdb.org/p/exports/{export_list}_ids_{datestamp}.json.gz'
-        raw_list = [json_loads(i) for i in Downloader(download_url=download_url).get_gzip_text().splitlines()]
-        return sorted(raw_list, key=lambda k: k.get(sorting, ''), reverse=reverse) if sorting else raw_list
-
-    def get_daily_list(self, export_list, sorting=None, reverse=False):
+    def get_daily_list(self, export_list, page=None, limit=20):
+        """ Returns tuple of ([{'id', 'name'}], total_items) for page of daily id export """
         if not export_list:
-            return
+            return ([], 0)
         from resources.lib.addon.tmdate import get_datetime_now, get_timedelta
+        from resources.lib.api.tmdb.exports import DailyExport
         datestamp = get_datetime_now() - get_timedelta(days=2)
         datestamp = datestamp.strftime("%m_%d_%Y")
-        # Pickle results rather than cache due to being such a large list
-        return use_json_filecache(
-            self._get_downloaded_list,
-            export_list=export_list, sorting=sorting, reverse=reverse, datestamp=datestamp,
-            cache_name=f'TMDb.Downloaded.List.v3.{export_list}.{sorting}.{reverse}')
+        offset = (try_int(page, fallback=1) - 1) * limit
+        return DailyExport(export_list).get_page(datestamp, offset, limit)
 
     def get_all_items_list(self, tmdb_type, page=None):
         try:
             schema = TMDB_ALL_ITEMS_LISTS[tmdb_type]
         except KeyError:
             return
-        daily_list = self.get_daily_list(
-            export_list=schema.get('type'),
-            sorting=False, reverse=False)
+        limit = schema.get('limit', 20)
+        daily_list, daily_list_total = self.get_daily_list(export_list=schema.get('type'), page=page, limit=limit)
         if not daily_list:
             return
         items = []
         param = schema.get('params', {})
-        limit = schema.get('limit', 20)
         pos_z = try_int(page, fallback=1) * limit
-        pos_a = pos_z - limit
         dbtype = convert_type(tmdb_type, 'dbtype')
-        for i in daily_list[pos_a:pos_z]:
+        for i in daily_list:
             if not i.get('id'):
                 continue
             item = {
@@ -475,7 +514,7 @@ class TMDb(RequestAPI):
             return []
         if schema.get('sort'):
             items = sorted(items, key=lambda k: k.get('label', ''))
-        if len(daily_list) > pos_z:
+        if daily_list_total > pos_z:
             items.append({'next_page': try_int(page, fallback=1) + 1})
         return items
 
@@ -0,0 +1,132 @@
+import os
+import zlib
+import sqlite3
+from resources.lib.addon.logger import kodi_log
+from resources.lib.addon.consts import CACHE_LONG
+from resources.lib.files.futils import get_file_path
+
+""" Lazyimports
+import requests
+from resources.lib.addon.dialog import BusyDialog
+from resources.lib.addon.locks import use_process_lock
+from resources.lib.addon.tmdate import set_timestamp
+from resources.lib.files.downloader import Downloader
+"""
+
+
+EXPORTS_FOLDER = 'tmdb_exports'
+EXPORTS_VERSION = 1  # Increment if format of export database changes
+EXPORTS_URL = 'https://files.tmdb.org/p/exports/{export_list}_ids_{datestamp}.json.gz'
+EXPORTS_BATCH_ROWS = 5000  # Rows inserted per executemany while streaming download
+
+
+def _get_export_rows(records):
+    """ Yield (id, name) rows from records of export as they stream in """
+    for i in records:
+        if not i.get('id'):
+            continue
+        yield (i['id'], i.get('name') or i.get('original_title') or i.get('original_name'))
+
+
+class DailyExport(object):
+    """
+    TMDb daily id export stored as an SQLite table in file order so that pages are read by rowid without loading the list
+    Export is downloaded again after CACHE_LONG days
+    """
+    def __init__(self, export_list):
+        self.export_list = export_list
+        self.db_file = get_file_path(EXPORTS_FOLDER, f'{export_list}.db')
+
+    def _connect(self):
+        if not os.path.exists(self.db_file):
+            return
+        from resources.lib.addon.tmdate import set_timestamp
+        connection = sqlite3.connect(self.db_file, timeout=5)
+        try:
+            expires, version = connection.execute('SELECT expires, version FROM meta').fetchone()
+            if version == EXPORTS_VERSION and expires > set_timestamp(0, True):
+                return connection
+        except (sqlite3.Error, TypeError):
+            pass
+        connection.close()
+
+    def _ingest(self, datestamp):
+        """ Stream export into temporary database and replace existing database when complete """
+        import requests
+        from resources.lib.addon.dialog import BusyDialog
+        from resources.lib.addon.tmdate import set_timestamp
+        from resources.lib.files.downloader import Downloader
+        download_url = EXPORTS_URL.format(export_list=self.export_list, datestamp=datestamp)
+        tmp_file = f'{self.db_file}.tmp'
+        self._remove_tmp_file(tmp_file)
+        connection = sqlite3.connect(tmp_file)
+        count = 0
+        try:
+            connection.execute('PRAGMA journal_mode=OFF')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute('CREATE TABLE items (tmdb_id INTEGER, name TEXT)')
+            connection.execute('CREATE TABLE meta (expires INTEGER, version INTEGER, datestamp TEXT)')
+            rows = []
+            with BusyDialog():
+                for row in _get_export_rows(Downloader(download_url=download_url).get_gzip_records()):
+                    rows.append(row)
+                    if len(rows) < EXPORTS_BATCH_ROWS:
+                        continue
+                    connection.executemany('INSERT INTO items VALUES (?, ?)', rows)
+                    count, rows = count + len(rows), []
+                connection.executemany('INSERT INTO items VALUES (?, ?)', rows)
+                count += len(rows)
+            if count:
+                connection.execute(
+                    'INSERT INTO meta VALUES (?, ?, ?)',
+                    (set_timestamp(CACHE_LONG * 24 * 60 * 60, True), EXPORTS_VERSION, datestamp))
+                connection.commit()
+        except (sqlite3.Error, OSError, EOFError, zlib.error, requests.exceptions.RequestException) as exc:
+            kodi_log(f'TMDb export {self.export_list} ingest FAILED!\n{exc}', 1)
+            count = 0
+        finally:
+            connection.close()
+        if not count:
+            self._remove_tmp_file(tmp_file)
+            return False
+        os.replace(tmp_file, self.db_file)
+        kodi_log(f'TMDb export {self.export_list} stored {count} items', 2)
+        return True
+
+    @staticmethod
+    def _remove_tmp_file(tmp_file):
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+
+    def get_connection(self, datestamp):
+        """ Get connection to export database. Export is downloaded first if missing or expired """
+        connection = self._connect()
+        if connection:
+            return connection
+        from resources.lib.addon.locks import use_process_lock
+        with use_process_lock(f'DailyExport.{self.export_list}', timeout=300) as acquired:
+            connection = self._connect()  # Other process might have stored export while we waited for lock
+            if not acquired:  # Other process is still ingesting so don't write to the same temporary database
+                kodi_log(f'TMDb export {self.export_list} lock timed out', 1)
+                return connection
+            if connection or not self._ingest(datestamp):
+                return connection
+            return self._connect()
+
+    def get_page(self, datestamp, offset, limit):
+        """ Returns tuple of ([{'id', 'name'}], total_items) for slice of export """
+        connection = self.get_connection(datestamp)
+        if not connection:
+            return ([], 0)
+        try:
+            total = connection.execute('SELECT MAX(rowid) FROM items').fetchone()[0] or 0
+            items = connection.execute(
+                'SELECT tmdb_id, name FROM items WHERE rowid > ? ORDER BY rowid LIMIT ?', (offset, limit)).fetchall()
+        except sqlite3.Error as exc:
+            kodi_log(f'TMDb export {self.export_list} read FAILED!\n{exc}', 1)
+            return ([], 0)
+        finally:
+            connection.close()
+        return ([{'id': i[0], 'name': i[1]} for i in items], total)
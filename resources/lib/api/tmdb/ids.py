@@ -0,0 +1,116 @@
+from tmdbhelper.parser import try_int
+from resources.lib.addon.consts import CACHE_EXTENDED
+from resources.lib.files.futils import validify_filename
+
+
+IDS_CACHE_NAME = 'TMDbIds.v1'
+IDS_CACHE_DAYS = CACHE_EXTENDED
+IDS_TMDB_TYPES = ('movie', 'tv')
+IDS_TRAKT_TYPES = {'movie': 'movie', 'show': 'tv'}
+
+
+def get_query_title(tmdb_type, query):
+    """ Normalise title for lookup using same scrubbing as TMDb.get_tmdb_id search """
+    if not query:
+        return
+    if tmdb_type in IDS_TMDB_TYPES:
+        query = query.split(' (', 1)[0]
+    return validify_filename(f'{query}'.lower(), alphanum=True) or None
+
+
+def get_lookup_names(tmdb_type, imdb_id=None, tvdb_id=None, trakt_id=None, query=None, year=None, **kwargs):
+    """ Cache names to check for tmdb_id in order of preference """
+    if tmdb_type not in IDS_TMDB_TYPES:
+        return []
+    names = []
+    if imdb_id:
+        names.append(f'{IDS_CACHE_NAME}.{tmdb_type}.imdb.{imdb_id}')
+    if tvdb_id:
+        names.append(f'{IDS_CACHE_NAME}.{tmdb_type}.tvdb.{tvdb_id}')
+    if trakt_id:
+        names.append(f'{IDS_CACHE_NAME}.{tmdb_type}.trakt.{trakt_id}')
+    title = get_query_title(tmdb_type, query) if year else None  # Only trust title lookups with year to avoid remakes
+    if title:
+        names.append(f'{IDS_CACHE_NAME}.{tmdb_type}.title.{title}.{year}')
+    return names
+
+
+def get_details_ids(tmdb_type, details):
+    """ Get dict of external ids and titles from TMDb details response with external_ids appended """
+    external_ids = details.get('external_ids') or {}
+    date = details.get('release_date') if tmdb_type == 'movie' else details.get('first_air_date')
+    return {
+        'imdb_id': external_ids.get('imdb_id') or details.get('imdb_id'),
+        'tvdb_id': external_ids.get('tvdb_id'),
+        'titles': {details.get('title') or details.get('name'), details.get('original_title') or details.get('original_name')},
+        'year': date[:4] if date else None}
+
+
+def get_trakt_ids(item):
+    """ Get tmdb_type and dict of ids for each movie and show in Trakt sync or list item """
+    for trakt_type, tmdb_type in IDS_TRAKT_TYPES.items():
+        try:
+            ids = item[trakt_type]['ids']
+        except (KeyError, TypeError):
+            continue
+        if not ids.get('tmdb'):
+            continue
+        yield tmdb_type, ids['tmdb'], {
+            'imdb_id': ids.get('imdb'),
+            'tvdb_id': ids.get('tvdb') if tmdb_type == 'tv' else None,
+            'trakt_id': ids.get('trakt')}
+
+
+def get_ids_rows(tmdb_type, tmdb_id, imdb_id=None, tvdb_id=None, trakt_id=None, titles=None, year=None):
+    """ Get dict of {cache_name: (tmdb_id, cache_days)} for set_cache_many """
+    tmdb_id = try_int(tmdb_id)
+    if tmdb_type not in IDS_TMDB_TYPES or not tmdb_id:
+        return {}
+    ids = [('imdb', imdb_id), ('tvdb', tvdb_id), ('trakt', trakt_id)]
+    ids += [('title', f'{title}.{year}') for title in {get_query_title(tmdb_type, i) for i in titles or ()} if title and year]
+    return {f'{IDS_CACHE_NAME}.{tmdb_type}.{k}.{v}': (tmdb_id, IDS_CACHE_DAYS) for k, v in ids if v}
+
+
+class TMDbIdIndex(object):
+    """
+    Persistent cross-reference of imdb / tvdb / trakt ids and title + year to tmdb_id
+    Stored in TMDb cache so lookups for many items are a single query and writes go through the cache writer
+    Ids are only added from fresh responses so cached details are not written again on every lookup
+    """
+    def __init__(self, cache):
+        self._cache = cache
+
+    def get_tmdb_ids(self, lookups):
+        """ Get tmdb_id for each dict of get_tmdb_id kwargs in lookups. Returns list in same order with None for misses """
+        lookup_names = [get_lookup_names(**i) for i in lookups]
+        cache_names = {j for i in lookup_names for j in i}
+        if not cache_names:
+            return [None for i in lookups]
+        cached = self._cache.get_cache_many(list(cache_names)) or {}
+        return [next((cached[j] for j in i if cached.get(j)), None) for i in lookup_names]
+
+    def get_tmdb_id(self, tmdb_type, **kwargs):
+        return self.get_tmdb_ids([dict(tmdb_type=tmdb_type, **kwargs)])[0]
+
+    def set_ids(self, tmdb_type, tmdb_id, **kwargs):
+        """ Add ids for tmdb_id to index """
+        rows = get_ids_rows(tmdb_type, tmdb_id, **kwargs)
+        if not rows:
+            return
+        self._cache.set_cache_many(rows)
+
+    def set_trakt_items(self, items):
+        """ Add trakt / imdb / tvdb ids of movies and shows in Trakt response to index in one batch """
+        rows = {}
+        for i in items or ():
+            for tmdb_type, tmdb_id, ids in get_trakt_ids(i):
+                rows.update(get_ids_rows(tmdb_type, tmdb_id, **ids))
+        if not rows:
+            return
+        self._cache.set_cache_many(rows)
+
+    def set_details(self, tmdb_type, details):
+        """ Add ids from TMDb details response to index """
+        if not details or not details.get('id'):
+            return
+        self.set_ids(tmdb_type, details['id'], **get_details_ids(tmdb_type, details))
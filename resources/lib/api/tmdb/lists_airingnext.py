@@ -52,10 +52,8 @@ class ListAiringNext(Container):
                 'season': item['infolabels']['season']}
             return self.tmdb_api._cache.set_cache(item, cache_name=cache_name, cache_days=cache_days)
 
-        def _get_nextaired_item_thread(i):
-            tmdb_id = i.get('tmdb_id') or self.tmdb_api.get_tmdb_id(
-                tmdb_type='tv', imdb_id=i.get('imdb_id'), tvdb_id=i.get('tvdb_id'),
-                query=i.get('showtitle') or i.get('title'), year=i.get('year'))
+        def _get_nextaired_item_thread(x):
+            i, tmdb_id = seed_items[x], tmdb_ids[x]
             if not tmdb_id:
                 return
 
@@ -66,7 +64,11 @@ class ListAiringNext(Container):
             item['infolabels']['tvshowtitle'] = i.get('showtitle') or i.get('title')
             return item
 
-        with ParallelThread(seed_items, _get_nextaired_item_thread) as pt:
+        tmdb_ids = self.tmdb_api.get_tmdb_id_list([{
+            'tmdb_type': 'tv', 'tmdb_id': i.get('tmdb_id'), 'imdb_id': i.get('imdb_id'), 'tvdb_id': i.get('tvdb_id'),
+            'query': i.get('showtitle') or i.get('title'), 'year': i.get('year')} for i in seed_items])
+
+        with ParallelThread(list(range(len(seed_items))), _get_nextaired_item_thread) as pt:
             item_queue = pt.queue
         items = [i for i in item_queue if i]
         items = sorted(items, key=lambda i: i['infoproperties'][f'{prefix}.original'], reverse=reverse)
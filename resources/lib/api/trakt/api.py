@@ -13,11 +13,18 @@ from resources.lib.api.request import RequestAPI
 from resources.lib.api.trakt.items import TraktItems
 from resources.lib.api.trakt.decorators import is_authorized, use_activity_cache
 from resources.lib.api.trakt.progress import _TraktProgress
+from resources.lib.api.trakt.delta import TraktDeltaSync, DELTA_SYNC_PATHS
 from resources.lib.addon.logger import kodi_log, TimerFunc
 from resources.lib.addon.consts import CACHE_SHORT, CACHE_LONG
-from resources.lib.addon.thread import has_property_lock, use_thread_lock
+from resources.lib.addon.thread import use_thread_lock
+from resources.lib.addon.locks import use_process_lock
 from timeit import default_timer as timer
 
+""" Lazyimports
+from resources.lib.files.bcache import BasicCache
+from resources.lib.api.tmdb.ids import TMDbIdIndex
+"""
+
 
 API_URL = 'https://api.trakt.tv/'
 CLIENT_ID = 'e6fde6173adf3c6af8fd1b0694b9b84d7c519cefc24482310e1de06c6abe5467'
@@ -342,6 +349,11 @@ class _TraktSync():
             return activities.get(activity_type, {})
         return activities.get(activity_type, {}).get(activity_key)
 
+    def _set_last_activities(self, response, expires=90):
+        """ Publish last_activities to other processes until expiry (in seconds) """
+        get_property('TraktSyncLastActivities', set_property=data_dumps(response))  # Dump data to property
+        get_property('TraktSyncLastActivities.Expires', set_property=set_timestamp(expires, True))  # Set activity expiry
+
     @is_authorized
     def _get_last_activity(self, activity_type=None, activity_key=None, cache_refresh=False):
         def _cache_expired():
@@ -352,22 +364,20 @@ class _TraktSync():
             return False
 
         def _cache_activity():
-            """ Get last_activities from Trakt and add to cache while locking other lookup threads """
-            get_property('TraktSyncLastActivities.Locked', 1)  # Lock other threads
+            """ Get last_activities from Trakt and add to cache """
             response = self.get_response_json('sync/last_activities')  # Retrieve data from Trakt
             if response:
-                get_property('TraktSyncLastActivities', set_property=data_dumps(response))  # Dump data to property
-                get_property('TraktSyncLastActivities.Expires', set_property=set_timestamp(90, True))  # Set activity expiry
-            get_property('TraktSyncLastActivities.Locked', clear_property=True)  # Clear thread lock
+                self._set_last_activities(response)
             return response
 
         def _cache_router():
             """ Routes between getting cached object or new lookup """
             if not _cache_expired():
                 return data_loads(get_property('TraktSyncLastActivities'))
-            if has_property_lock('TraktSyncLastActivities.Locked'):  # Other thread getting data so wait for it
-                return data_loads(get_property('TraktSyncLastActivities'))
-            return _cache_activity()
+            with use_process_lock('TraktSyncLastActivities.Locked', timeout=5):
+                if not _cache_expired():  # Other thread got data while we waited for lock
+                    return data_loads(get_property('TraktSyncLastActivities'))
+                return _cache_activity()
 
         if not self.last_activities:
             self.last_activities = _cache_router()
@@ -378,13 +388,24 @@ class _TraktSync():
     def _get_sync_response(self, path, extended=None, allow_fallback=False):
         """ Quick sub-cache routine to avoid recalling full sync list if we also want to quicklist it """
         sync_name = f'sync_response.{path}.{extended}'
-        self.sync[sync_name] = self.sync.get(sync_name) or self.get_response_json(path, extended=extended)
+        if not self.sync.get(sync_name):
+            self.sync[sync_name] = self.get_response_json(path, extended=extended)
+            self.tmdb_ids.set_trakt_items(self.sync[sync_name])
+        return self.sync[sync_name]
+
+    def _get_sync_delta_response(self, path, extended=None):
+        """ Watched sync lists are updated from history since last sync rather than downloaded again """
+        sync_name = f'sync_response.{path}.{extended}'
+        self.sync[sync_name] = self.sync.get(sync_name) or TraktDeltaSync(self, path, extended).get_response()
         return self.sync[sync_name]
 
     @is_authorized
     def _get_sync(self, path, trakt_type, id_type=None, extended=None, allow_fallback=False):
         """ Get sync list """
-        response = self._get_sync_response(path, extended=extended, allow_fallback=allow_fallback)
+        if path in DELTA_SYNC_PATHS and get_setting('trakt_delta_sync'):
+            response = self._get_sync_delta_response(path, extended=extended)
+        else:
+            response = self._get_sync_response(path, extended=extended, allow_fallback=allow_fallback)
         if not id_type:
             return response
         if response and trakt_type:
@@ -464,7 +485,7 @@ class _TraktSync():
     def get_sync_recommendations_shows(self, trakt_type, id_type=None, extended=None):
         return self._get_sync('sync/recommendations/shows', 'show', id_type=id_type, extended=extended)
 
-    @use_thread_lock('TraktAPI.get_sync.Locked', timeout=10, polling=0.05, combine_name=True)
+    @use_thread_lock('TraktAPI.get_sync.Locked', timeout=10, combine_name=True)
     def get_sync(self, sync_type, trakt_type, id_type=None, extended=None):
         if sync_type == 'watched':
             func = self.get_sync_watched_movies if trakt_type == 'movie' else self.get_sync_watched_shows
@@ -496,9 +517,19 @@ class TraktAPI(RequestAPI, _TraktSync, _TraktLists, _TraktProgress):
         self.last_activities = {}
         self.sync_activities = {}
         self.sync = {}
+        self._tmdb_ids = None
         self.item_limit = 83 if get_setting('trakt_expandedlimit') else 20  # 84 (83+NextPage) has common factors 4,6,7,8 suitable for wall views
         self.login() if force else self.authorize()
 
+    @property
+    def tmdb_ids(self):
+        """ Index in TMDb cache so ids in Trakt responses can be resolved to tmdb_id without a search """
+        if self._tmdb_ids is None:
+            from resources.lib.files.bcache import BasicCache
+            from resources.lib.api.tmdb.ids import TMDbIdIndex
+            self._tmdb_ids = TMDbIdIndex(BasicCache(filename='TMDb.db'))
+        return self._tmdb_ids
+
     def authorize(self, login=False):
         def _get_token():
             token = self.get_stored_token()
@@ -528,26 +559,25 @@ class TraktAPI(RequestAPI, _TraktSync, _TraktLists, _TraktProgress):
         # First time authorization in this session so let's confirm
         if self.authorization and get_property('TraktIsAuth') != 'True':
             if not get_timestamp(get_property('TraktRefreshTimeStamp', is_type=float) or 0):
-                if has_property_lock('TraktCheckingAuth'):  # Wait if another thread is checking authorization
-                    _get_token()  # Get the token set in the other thread
-                    return self.authorization  # Another thread checked token so return
-
-                get_property('TraktCheckingAuth', 1)  # Set Thread lock property
-                kodi_log('Trakt authorization started', 1)
-
-                # Check if we can get a response from user account
-                with TimerFunc('Trakt authorization took', inline=True) as tf:
-                    response = self.get_simple_api_request('https://api.trakt.tv/sync/last_activities', headers=self.headers)
-                    if not response or response.status_code == 401:  # 401 is unauthorized error code so let's try refreshing the token
-                        kodi_log('Trakt unauthorized!', 1)
-                        self.authorization = self.refresh_token()
-                    if self.authorization:  # Authorization confirmed so let's set a window property for future reference in this session
-                        kodi_log('Trakt user account authorized', 1)
-                        get_property('TraktIsAuth', 'True')
-                    get_property('TraktCheckingAuth', clear_property=True)
-                    if get_setting('startup_notifications'):
-                        total_time = timer() - tf.timer_a
-                        Dialog().notification('TMDbHelper', f'Trakt authorized in {total_time:.3f}s', icon=f'{ADDONPATH}/icon.png')
+                with use_process_lock('TraktCheckingAuth', timeout=5):  # Wait if another thread is checking authorization
+                    if get_property('TraktIsAuth') == 'True':
+                        _get_token()  # Get the token set in the other thread
+                        return self.authorization  # Another thread checked token so return
+
+                    kodi_log('Trakt authorization started', 1)
+
+                    # Check if we can get a response from user account
+                    with TimerFunc('Trakt authorization took', inline=True) as tf:
+                        response = self.get_simple_api_request('https://api.trakt.tv/sync/last_activities', headers=self.headers)
+                        if not response or response.status_code == 401:  # 401 is unauthorized error code so let's try refreshing the token
+                            kodi_log('Trakt unauthorized!', 1)
+                            self.authorization = self.refresh_token()
+                        if self.authorization:  # Authorization confirmed so let's set a window property for future reference in this session
+                            kodi_log('Trakt user account authorized', 1)
+                            get_property('TraktIsAuth', 'True')
+                        if get_setting('startup_notifications'):
+                            total_time = timer() - tf.timer_a
+                            Dialog().notification('TMDbHelper', f'Trakt authorized in {total_time:.3f}s', icon=f'{ADDONPATH}/icon.png')
 
         return self.authorization
 
@@ -0,0 +1,136 @@
+from tmdbhelper.parser import try_int
+from resources.lib.addon.tmdate import convert_timestamp, get_datetime_now, get_timedelta
+from resources.lib.addon.logger import kodi_log
+from resources.lib.addon.consts import CACHE_SHORT
+from resources.lib.files.futils import pickle_deepcopy
+
+
+DELTA_SYNC_PATHS = {
+    'sync/watched/movies': ('movies', 'movie')}  # path: (activity_type, history_type)
+# sync/watched/shows is not delta synced because it carries show metadata (e.g. aired_episodes) which history cannot update
+DELTA_PAGE_LIMIT = 100  # Number of history items per page
+DELTA_MAX_PAGES = 5  # More history than this since last sync means a full resync is cheaper
+DELTA_MAX_AGE = CACHE_SHORT  # Days before forcing a full resync to pick up changes that history cannot show (e.g. removals)
+DELTA_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.000Z'
+
+
+def _get_trakt_id(item):
+    try:
+        return item['ids']['trakt']
+    except (KeyError, TypeError):
+        return
+
+
+def _get_later_timestamp(a, b):
+    if not a or not b:
+        return a or b
+    return a if convert_timestamp(a) >= convert_timestamp(b) else b
+
+
+def _get_cursor(response, key='last_watched_at'):
+    cursor = None
+    for i in response or []:
+        cursor = _get_later_timestamp(cursor, i.get(key))
+    return cursor
+
+
+def merge_watched_movies(response, history):
+    """ Add movie watch events from sync/history to sync/watched/movies response """
+    lookup = {_get_trakt_id(i.get('movie')): i for i in response}
+    for event in history:
+        trakt_id = _get_trakt_id(event.get('movie'))
+        watched_at = event.get('watched_at')
+        if not trakt_id or not watched_at:
+            return False
+        try:
+            item = lookup[trakt_id]
+        except KeyError:
+            item = lookup[trakt_id] = {'plays': 0, 'movie': event['movie']}
+            response.append(item)
+        item['plays'] = item.get('plays', 0) + 1
+        item['last_watched_at'] = _get_later_timestamp(item.get('last_watched_at'), watched_at)
+        item['last_updated_at'] = _get_later_timestamp(item.get('last_updated_at'), watched_at)
+    return True
+
+
+class TraktDeltaSync():
+    """
+    Keeps a local copy of a watched sync list which is updated from sync/history since the last sync
+    Falls back to downloading the full sync list if the history cannot be merged consistently
+    """
+    def __init__(self, trakt_api, path, extended=None):
+        self._trakt = trakt_api
+        self.path = path
+        self.extended = extended
+        self.activity_type, self.history_type = DELTA_SYNC_PATHS[path]
+        self.cache_name = f'TraktDeltaSync.{path}.{extended}'
+
+    def get_history(self, start_at):
+        """ Get watch history since start_at. Returns None if there is too much history to merge """
+        history = []
+        for page in range(1, DELTA_MAX_PAGES + 1):
+            response = self._trakt.get_response(
+                'sync/history', f'{self.history_type}s',
+                start_at=start_at, page=page, limit=DELTA_PAGE_LIMIT, extended=self.extended)
+            if response is None:
+                return
+            try:
+                history += response.json() or []
+            except ValueError:
+                return
+            if page >= try_int(response.headers.get('X-Pagination-Page-Count'), fallback=1):
+                return history
+
+    def get_delta(self, store, last_activity):
+        """ Merge history since last sync into stored response. Returns None if full resync required """
+        if not store or not store.get('response') or not store.get('cursor') or not store.get('synced_at'):
+            return
+        if convert_timestamp(store['synced_at']) < get_datetime_now() - get_timedelta(days=DELTA_MAX_AGE):
+            return
+        history = self.get_history(store['cursor'])
+        if history is None:
+            return
+
+        # Skip events at the cursor timestamp which are already merged
+        # After a full sync cursor_ids is None because event ids are unknown so skip all events at the cursor
+        cursor, cursor_ids = convert_timestamp(store['cursor']), store.get('cursor_ids')
+        history = [
+            i for i in history
+            if convert_timestamp(i.get('watched_at')) != cursor or (cursor_ids is not None and i.get('id') not in cursor_ids)]
+        if not history:
+            return  # Activity changed without new watches so history was removed or backdated
+        store = pickle_deepcopy(store)  # Don't modify cached object in case merge fails part way through
+        if not merge_watched_movies(store['response'], history):
+            return
+
+        store['cursor'] = _get_later_timestamp(store['cursor'], _get_cursor(history, 'watched_at'))
+        cursor_ids = (cursor_ids or []) if convert_timestamp(store['cursor']) == cursor else []
+        store['cursor_ids'] = cursor_ids + [
+            i.get('id') for i in history if convert_timestamp(i.get('watched_at')) == convert_timestamp(store['cursor'])]
+        store['last_activity'] = last_activity
+        self._trakt.tmdb_ids.set_trakt_items(history)
+        kodi_log(f'TraktDeltaSync {self.path} merged {len(history)} history items', 2)
+        return store
+
+    def get_full(self, last_activity):
+        response = self._trakt.get_response_json(self.path, extended=self.extended)
+        if not response or not isinstance(response, list):
+            return
+        self._trakt.tmdb_ids.set_trakt_items(response)
+        return {
+            'response': response,
+            'last_activity': last_activity,
+            'synced_at': get_datetime_now().strftime(DELTA_DATE_FORMAT),
+            'cursor': _get_cursor(response),
+            'cursor_ids': None}
+
+    def get_response(self):
+        last_activity = self._trakt._get_last_activity(self.activity_type, 'watched_at')
+        store = self._trakt._cache.get_cache(self.cache_name)
+        if store and last_activity and store.get('last_activity') == last_activity and store.get('response'):
+            return store['response']
+        store = self.get_delta(store, last_activity) or self.get_full(last_activity)
+        if not store:
+            return
+        self._trakt._cache.set_cache(store, cache_name=self.cache_name, cache_days=DELTA_MAX_AGE)
+        return store['response']
@@ -12,6 +12,53 @@ from resources.lib.addon.consts import CACHE_SHORT, CACHE_LONG
 from resources.lib.addon.window import get_property
 
 
+def _is_watched_before_reset(episode, reset_at):
+    try:
+        return convert_timestamp(episode.get('last_watched_at')) < reset_at
+    except TypeError:
+        return True
+
+
+def _get_episodes_watchcount(tvshow, season=None, exclude_specials=True, count_progress=False):
+    reset_at = None
+    if count_progress and tvshow.get('reset_at'):
+        reset_at = convert_timestamp(tvshow['reset_at'])
+    count = 0
+    for i in tvshow.get('seasons', []):
+        if season is not None and i.get('number', -1) != season:
+            continue
+        if exclude_specials and i.get('number') == 0:
+            continue
+        # Reset_at is None so just count length of watched episode list
+        if not reset_at:
+            count += len(i.get('episodes', []))
+            continue
+        # Reset_at has a value so check progress rather than just watched count
+        count += len([j for j in i.get('episodes', []) if _is_watched_before_reset(j, reset_at)])
+    return count
+
+
+def _get_watched_index_key(value):
+    """ Convert numeric keys to int like json_loads does so lookups match index from memory or from cache """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _get_watched_index_item(tvshow):
+    reset_at = convert_timestamp(tvshow['reset_at']) if tvshow.get('reset_at') else None
+    item = {'seasons': {}, 'watched': {}, 'progress': {}, 'reset_at': tvshow.get('reset_at')}
+    for i in tvshow.get('seasons') or []:
+        season = _get_watched_index_key(i.get('number', -1))
+        episodes = i.get('episodes') or []
+        item['seasons'][season] = {_get_watched_index_key(j.get('number', -1)): j.get('plays', 1) for j in episodes}
+        item['watched'][season] = len(episodes)
+        if reset_at:
+            item['progress'][season] = len([j for j in episodes if _is_watched_before_reset(j, reset_at)])
+    return item
+
+
 class _TraktProgress():
     @is_authorized
     def get_ondeck_list(self, page=1, limit=None, sort_by=None, sort_how=None, trakt_type=None):
@@ -121,39 +168,27 @@ class _TraktProgress():
         return item
 
     @is_authorized
-    @use_activity_cache('episodes', 'watched_at', cache_days=CACHE_LONG)
     def get_episodes_watchcount(
             self, unique_id, id_type, season=None, exclude_specials=True,
             tvshow=None, count_progress=False):
         """
         Get the number of episodes watched in a show or season
-        Pass tvshow dict directly for speed otherwise will look-up ID from watched sync list
+        Pass tvshow dict directly to count from it otherwise counts are looked up from indexed watched sync list
         Use count_progress to check progress against reset_at value rather than just count watched
         """
         season = try_int(season) if season is not None else None
-        if not tvshow and id_type and unique_id:
-            tvshow = self.get_sync('watched', 'show', id_type, extended='full').get(unique_id)
-        if not tvshow:
+        if tvshow:
+            return _get_episodes_watchcount(tvshow, season, exclude_specials, count_progress)
+        if not id_type or not unique_id:
             return
-        reset_at = None
-        if count_progress and tvshow.get('reset_at'):
-            reset_at = convert_timestamp(tvshow['reset_at'])
-        count = 0
-        for i in tvshow.get('seasons', []):
-            if season is not None and i.get('number', -1) != season:
-                continue
-            if exclude_specials and i.get('number') == 0:
-                continue
-            # Reset_at is None so just count length of watched episode list
-            if not reset_at:
-                count += len(i.get('episodes', []))
-                continue
-            # Reset_at has a value so check progress rather than just watched count
-            for j in i.get('episodes', []):
-                if convert_timestamp(j.get('last_watched_at')) >= reset_at:
-                    continue
-                count += 1
-        return count
+        try:
+            tvshow = self.get_watched_index(id_type)[_get_watched_index_key(unique_id)]
+        except (KeyError, TypeError):
+            return
+        counts = tvshow['progress'] if count_progress and tvshow.get('reset_at') else tvshow['watched']
+        if season is not None:
+            return 0 if exclude_specials and season == 0 else counts.get(season, 0)
+        return sum(v for k, v in counts.items() if not exclude_specials or k != 0)
 
     @is_authorized
     @use_activity_cache(cache_days=CACHE_LONG)
@@ -296,7 +331,7 @@ class _TraktProgress():
             return
 
     @is_authorized
-    @use_thread_lock("TraktAPI._get_episode_playprogress.Locked", timeout=10, polling=0.05)
+    @use_thread_lock("TraktAPI._get_episode_playprogress.Locked", timeout=10)
     @use_activity_cache('episodes', 'paused_at', cache_days=CACHE_LONG)
     def _get_episode_playprogress(self, id_type):
         sync_list = self.get_sync('playback', 'show')
@@ -350,24 +385,30 @@ class _TraktProgress():
             return
 
     @is_authorized
-    @use_activity_cache('episodes', 'watched_at', cache_days=CACHE_LONG)
     def get_episode_playcount(self, unique_id, id_type, season, episode):
-        season = try_int(season, fallback=-2)  # Make fallback -2 to prevent matching on 0
-        episode = try_int(episode, fallback=-2)  # Make fallback -2 to prevent matching on 0
         try:
-            response = self.get_sync('watched', 'show', id_type, extended='full')[unique_id]['seasons']
-        except (KeyError, AttributeError):
+            return self.get_watched_index(id_type)[_get_watched_index_key(unique_id)]['seasons'][try_int(season, fallback=-2)][try_int(episode, fallback=-2)]
+        except (KeyError, TypeError):
             return
-        for i in response:
-            if i.get('number', -1) != season:
-                continue
-            try:
-                episodes = i['episodes']
-            except KeyError:
-                continue
-            for j in episodes:
-                if j.get('number', -1) == episode:
-                    return j.get('plays', 1)
+
+    @is_authorized
+    @use_thread_lock("TraktAPI._get_watched_index.Locked", timeout=10)
+    @use_activity_cache('episodes', 'watched_at', cache_days=CACHE_LONG)
+    def _get_watched_index(self, id_type):
+        """
+        Index watched shows sync list so that per item checks are dictionary lookups
+        {id: {'seasons': {season: {episode: plays}}, 'watched': {season: count}, 'progress': {season: count}, 'reset_at': reset_at}}
+        Numeric keys are ints because json_loads converts them when the index is read back from cache
+        """
+        sync_list = self.get_sync('watched', 'show', id_type, extended='full')
+        if not sync_list:
+            return {}
+        return {_get_watched_index_key(k): _get_watched_index_item(v) for k, v in sync_list.items() if k}
+
+    def get_watched_index(self, id_type):
+        sync_name = f'watched_index.{id_type}'
+        self.sync[sync_name] = self.sync.get(sync_name) or self._get_watched_index(id_type)
+        return self.sync[sync_name] or {}
 
     @is_authorized
     def get_episodes_airedcount(self, unique_id, id_type, season=None):
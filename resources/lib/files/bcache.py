@@ -1,3 +1,5 @@
+from copy import deepcopy
+from threading import Lock, Event
 from resources.lib.addon.plugin import format_name
 from resources.lib.files.futils import get_filecache_name
 from resources.lib.addon.logger import kodi_log, kodi_try_except
@@ -7,6 +9,19 @@ from resources.lib.files.scache import SimpleCache
 """
 
 SEARCH_HISTORY = 'search_history.db'
+SINGLEFLIGHT_TIMEOUT = 30  # Max seconds to wait for another caller to retrieve the same object
+
+
+class _Flight(object):
+    """ In-flight call to func for a cache_name that other threads can wait on """
+    def __init__(self):
+        self.event = Event()
+        self.result = None
+        self.waiters = 0
+
+
+_flights = {}
+_flights_lock = Lock()
 
 
 class BasicCache(object):
@@ -27,6 +42,14 @@ class BasicCache(object):
         cache_name = get_filecache_name(cache_name or '')
         return self._cache.get(cache_name)
 
+    @kodi_try_except('lib.addon.cache get_cache_many')
+    def get_cache_many(self, cache_names):
+        """ get multiple objects in one lookup - returns dict of {cache_name: my_object} for cached items """
+        self.ret_cache()
+        endpoints = {i: get_filecache_name(i or '') for i in cache_names}
+        results = self._cache.get_many(list(set(endpoints.values())))
+        return {k: results[v] for k, v in endpoints.items() if v in results}
+
     @kodi_try_except('lib.addon.cache set_cache')
     def set_cache(self, my_object, cache_name, cache_days=14, force=False, fallback=None):
         """ set object to cache via thread """
@@ -42,6 +65,13 @@ class BasicCache(object):
             cache_days = force if isinstance(force, int) else cache_days
         self._cache.set(cache_name, my_object, cache_days=cache_days)
 
+    @kodi_try_except('lib.addon.cache set_cache_many')
+    def set_cache_many(self, items):
+        """ set multiple objects in one transaction - items is dict of {cache_name: (my_object, cache_days)} """
+        self.ret_cache()
+        self._cache.set_many({get_filecache_name(k): v for k, v in items.items() if k})
+        return items
+
     @kodi_try_except('lib.addon.cache del_cache')
     def del_cache(self, cache_name):
         self.ret_cache()
@@ -68,8 +98,45 @@ class BasicCache(object):
         if not cache_only:
             if headers:
                 kwargs['headers'] = headers
-            my_object = func(*args, **kwargs)
-            return self.set_cache(my_object, cache_name, cache_days, force=cache_force, fallback=cache_fallback)
+            return self._use_single_flight(
+                func, *args,
+                cache_days=cache_days, cache_name=cache_name, cache_force=cache_force, cache_fallback=cache_fallback,
+                cache_refresh=cache_refresh, **kwargs)
+
+    def _use_single_flight(
+            self, func, *args,
+            cache_days=14, cache_name='', cache_force=False, cache_fallback=False, cache_refresh=False,
+            **kwargs):
+        """
+        Only first caller for cache_name does func -- concurrent callers wait and receive a copy of the same object
+        Threads in this process wait on an Event -- no lock is held across func so unrelated and nested requests never wait
+        """
+        flight_name = f'{self._filename}.{cache_name}'
+        with _flights_lock:
+            flight = _flights.get(flight_name)
+            is_leader = flight is None
+            if is_leader:
+                flight = _flights[flight_name] = _Flight()
+            else:
+                flight.waiters += 1
+        if not is_leader:
+            if flight.event.wait(SINGLEFLIGHT_TIMEOUT):
+                return deepcopy(flight.result)
+            flight = None  # Leader timed out so get object ourselves
+
+        my_object = None
+        try:
+            my_object = self.get_cache(cache_name) if not cache_refresh else None  # Previous leader or other process might have set object since our miss
+            if not my_object:
+                my_object = func(*args, **kwargs)
+                my_object = self.set_cache(my_object, cache_name, cache_days, force=cache_force, fallback=cache_fallback)
+        finally:
+            if flight:
+                with _flights_lock:
+                    _flights.pop(flight_name, None)
+                flight.result = deepcopy(my_object) if flight.waiters else None  # Snapshot so leader can modify its object
+                flight.event.set()
+        return my_object
 
 
 def use_simple_cache(cache_days=None):
@@ -1,8 +1,7 @@
 import os
 import xbmcvfs
-import gzip
+import zlib
 from xbmcgui import Dialog, ALPHANUM_HIDE_INPUT
-from io import BytesIO
 from urllib.parse import urlparse
 from resources.lib.addon.plugin import get_localized, ADDONNAME
 from resources.lib.addon.dialog import BusyDialog
@@ -10,14 +9,44 @@ from resources.lib.addon.logger import kodi_log
 
 """ Lazyimports
 import zipfile
+import shutil
 import requests
+from json import loads as json_loads
 """
 
+DOWNLOAD_CHUNK_SIZE = 64 * 1024  # Bytes read from response at a time when streaming
+
+
+def iter_gzip_chunks(response, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """ Decompress gzip response incrementally as chunks are downloaded. Raises EOFError if download is truncated """
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        while chunk:
+            yield decompressor.decompress(chunk)
+            chunk = decompressor.unused_data  # Concatenated gzip members so start new decompressor
+            if chunk:
+                decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    yield decompressor.flush()
+    if not decompressor.eof:
+        raise EOFError('Compressed file ended before the end-of-stream marker was reached')
+
+
+def iter_lines(chunks):
+    """ Split stream of byte chunks into lines without joining the whole stream """
+    pending = b''
+    for chunk in chunks:
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
 
 class Downloader(object):
     def __init__(self, download_url=None, extract_to=None):
         self.download_url = download_url
-        self.extract_to = xbmcvfs.translatePath(extract_to)
+        self.extract_to = xbmcvfs.translatePath(extract_to) if extract_to else None
         self.msg_cleardir = get_localized(32054)
 
     def recursive_delete_dir(self, fullpath):
@@ -100,27 +129,46 @@ class Downloader(object):
             except Exception as exc:
                 kodi_log(f'Could not delete file {file_path}: {exc}')
 
-    def get_gzip_text(self):
+    def get_gzip_chunks(self):
+        """ Generator of decompressed chunks of gzip file which are decompressed as they are downloaded """
         if not self.download_url:
             return
 
         with BusyDialog():
-            response = self.open_url(self.download_url)
+            response = self.open_url(self.download_url, stream=True)
         if not response:
             Dialog().ok(ADDONNAME, get_localized(32058))
             return
 
-        with gzip.GzipFile(fileobj=BytesIO(response.content)) as downloaded_gzip:
-            content = downloaded_gzip.read()
-        return content
+        with response:
+            for chunk in iter_gzip_chunks(response):
+                yield chunk
+
+    def get_gzip_text(self):
+        return b''.join(self.get_gzip_chunks()) if self.download_url else None
+
+    def get_gzip_lines(self):
+        """ Generator of lines from gzip file which are decompressed as they are downloaded """
+        for line in iter_lines(self.get_gzip_chunks()):
+            yield line
+
+    def get_gzip_records(self):
+        """ Generator of records from gzip file with one JSON object per line e.g. TMDb daily exports """
+        from json import loads as json_loads
+        for line in self.get_gzip_lines():
+            try:
+                yield json_loads(line)
+            except ValueError:
+                continue
 
     def get_extracted_zip(self):
         import zipfile
+        import shutil
         if not self.download_url or not self.extract_to:
             return
 
         with BusyDialog():
-            response = self.open_url(self.download_url)
+            response = self.open_url(self.download_url, stream=True)
         if not response:
             Dialog().ok(ADDONNAME, get_localized(32058))
             return
@@ -134,19 +182,22 @@ class Downloader(object):
 
         with BusyDialog():
             num_files = 0
-            with zipfile.ZipFile(BytesIO(response.content)) as downloaded_zip:
+            _tempzip = os.path.join(self.extract_to, 'temp.zip')
+            with response, open(_tempzip, 'wb') as target:  # Zip index is at end of file so stream to disk rather than memory
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    target.write(chunk)
+
+            with zipfile.ZipFile(_tempzip) as downloaded_zip:
                 for item in [x for x in downloaded_zip.namelist() if x.endswith('.json')]:
                     filename = os.path.basename(item)
                     if not filename:
                         continue
 
-                    _file = downloaded_zip.open(item)
-                    with open(os.path.join(self.extract_to, filename), 'wb') as target:
-                        target.write(_file.read())
+                    with downloaded_zip.open(item) as _file, open(os.path.join(self.extract_to, filename), 'wb') as target:
+                        shutil.copyfileobj(_file, target, DOWNLOAD_CHUNK_SIZE)
                         num_files += 1
 
             try:
-                _tempzip = os.path.join(self.extract_to, 'temp.zip')
                 os.remove(_tempzip)
             except Exception as exc:
                 kodi_log(f'Could not delete package {_tempzip}: {exc}')
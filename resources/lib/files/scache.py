@@ -1,23 +1,224 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 import zlib
+import pickle
+import marshal
 import xbmcvfs
 from xbmcgui import Window
-from xbmc import Monitor, sleep
+from xbmc import Monitor, Player, sleep, getGlobalIdleTime
 from contextlib import contextmanager
+from threading import Lock, Thread
+from queue import Queue, Empty
+from timeit import default_timer as timer
 from resources.lib.addon.plugin import get_setting
 from resources.lib.addon.logger import kodi_log
 from resources.lib.addon.tmdate import set_timestamp
-from resources.lib.files.futils import get_file_path
+from resources.lib.files.futils import get_file_path, get_write_path, get_files_in_folder
 from resources.lib.files.futils import json_loads as data_loads
 from json import dumps as data_dumps
 import sqlite3
 
 
 DATABASE_NAME = 'database_v5'
+DATABASE_SCHEMA = 1  # PRAGMA user_version -- increment and add migration to _set_schema() when changing schema
 TIME_MINUTES = 60
 TIME_HOURS = 60 * TIME_MINUTES
 TIME_DAYS = 24 * TIME_HOURS
+SQLITE_MAX_VARIABLES = 500
+WRITER_FLUSH_INTERVAL = 0.1  # Seconds to wait for more rows before committing a batch
+WRITER_FLUSH_ROWS = 100  # Commit batch early once this many rows are queued
+WRITER_IDLE_TIMEOUT = 1  # Seconds without new rows before writer thread exits
+WRITER_RETRIES = 3  # Attempts to commit a row before it is dropped
+WRITER_RETRY_WAIT = 0.5  # Seconds to wait after a failed commit before retrying
+CLEANUP_SLICE_ROWS = 200  # Max expired rows deleted per cleanup slice
+VACUUM_IDLE_TIME = 15 * TIME_MINUTES  # Seconds without user input before VACUUM may lock a database
+ZLIB_LEVEL = 1  # Fastest compression -- decompression speed is the same at any level
+PICKLE_PROTOCOL = min(5, pickle.HIGHEST_PROTOCOL)
+
+CODEC_JSON_ZLIB = 0  # Codec of every database row -- others are only compared by benchmark_codecs()
+CODEC_PICKLE_ZLIB = 1
+CODEC_MARSHAL_ZLIB = 2
+CODEC_PICKLE = 3
+
+
+def _json_zlib_loads(data):
+    try:
+        data = str(zlib.decompress(data), 'utf-8')
+    except TypeError:
+        pass
+    return data_loads(data)
+
+
+CODECS = {
+    CODEC_JSON_ZLIB: (
+        lambda data: zlib.compress(bytes(data_dumps(data, separators=(',', ':')), 'utf-8'), ZLIB_LEVEL),
+        _json_zlib_loads),
+    CODEC_PICKLE_ZLIB: (
+        lambda data: zlib.compress(pickle.dumps(data, PICKLE_PROTOCOL), ZLIB_LEVEL),
+        lambda data: pickle.loads(zlib.decompress(data))),
+    CODEC_MARSHAL_ZLIB: (
+        lambda data: zlib.compress(marshal.dumps(data), ZLIB_LEVEL),
+        lambda data: marshal.loads(zlib.decompress(data))),
+    CODEC_PICKLE: (
+        lambda data: pickle.dumps(data, PICKLE_PROTOCOL),
+        lambda data: pickle.loads(data))}
+
+
+def encode_text(data):
+    '''
+        serialise data to the json text shared by every cache layer (process, window property and database)
+        every layer decodes with the same json_loads so results have the same shape whichever layer answers
+    '''
+    try:
+        return data_dumps(data, separators=(',', ':'))
+    except (TypeError, ValueError) as exc:
+        kodi_log(f'CACHE: Encode ERROR ! -- {exc}', 1)
+
+
+def compress_text(text):
+    '''compress json text for database row'''
+    return zlib.compress(bytes(text, 'utf-8'), ZLIB_LEVEL)
+
+
+def decompress_text(data):
+    '''get json text from database row'''
+    try:
+        return str(zlib.decompress(data), 'utf-8')
+    except TypeError:
+        return data  # Uncompressed text
+    except (zlib.error, UnicodeDecodeError) as exc:
+        kodi_log(f'CACHE: Decode ERROR ! -- {exc}', 1)
+
+
+def decode_data(data):
+    '''decode object from database row'''
+    text = decompress_text(data)
+    return data_loads(text) if text else None
+
+
+def benchmark_codecs(rows, repeats=5):
+    '''
+        time encode and decode of database row data through each codec
+        objects are only loaded by other codecs after being encoded here so rows are never unpickled
+        returns dict of {codec: (encode_secs, decode_secs, total_bytes)}
+    '''
+    objects = [decode_data(data) for data in rows]
+    objects = [i for i in objects if i]
+    results = {}
+    for codec, (dumps, loads) in CODECS.items():
+        encoded = [dumps(i) for i in objects]
+        timer_a = timer()
+        for _ in range(repeats):
+            encoded = [dumps(i) for i in objects]
+        timer_b = timer()
+        for _ in range(repeats):
+            for i in encoded:
+                loads(i)
+        timer_c = timer()
+        results[codec] = ((timer_b - timer_a) / repeats, (timer_c - timer_b) / repeats, sum(len(i) for i in encoded))
+    return results
+
+
+class _CacheWriter(Thread):
+    '''single background writer per database file which commits queued rows in batched transactions'''
+
+    def __init__(self, db_file):
+        Thread.__init__(self, daemon=True)  # Daemon so plugin interpreters can exit -- callers use flush_writers() before exit
+        self._db_file = db_file
+        self._queue = Queue()
+        self._monitor = Monitor()
+        self._attempts = {}  # endpoint: failed commit attempts
+        self.cache = None  # SimpleCache used to write rows -- updated to most recent caller
+        self.pending = {}  # endpoint: (expires, data) queued but not yet committed
+        self.stopping = False
+
+    def put(self, cache, endpoint, expires, data):
+        self.cache = cache
+        self.pending[endpoint] = (expires, data)
+        self._queue.put((endpoint, expires, data))
+
+    def flush(self):
+        '''block until all queued rows have been committed'''
+        self._queue.join()
+
+    def _get_batch(self):
+        try:
+            rows = [self._queue.get(timeout=WRITER_IDLE_TIMEOUT)]
+        except Empty:
+            return []
+        timeend = timer() + WRITER_FLUSH_INTERVAL
+        while len(rows) < WRITER_FLUSH_ROWS:
+            timeout = 0 if self._monitor.abortRequested() else timeend - timer()
+            try:
+                rows.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except Empty:
+                break
+        return rows
+
+    def _write_batch(self, rows):
+        try:
+            committed = self.cache._set_db_cache_many(rows) is not None
+        except Exception as exc:
+            kodi_log(f'CACHE: Write Queue ERROR ! -- {exc}\n{self._db_file}', 1)
+            committed = False
+        for row in rows:
+            if self.pending.get(row[0]) == row[1:]:  # Otherwise newer value for endpoint is queued after this row
+                self._set_written(row, committed)
+            self._queue.task_done()
+        if not committed:
+            self._monitor.waitForAbort(WRITER_RETRY_WAIT)
+
+    def _set_written(self, row, committed):
+        '''remove committed row from pending or queue it again until it has failed WRITER_RETRIES times'''
+        endpoint = row[0]
+        attempts = 0 if committed else self._attempts.get(endpoint, 0) + 1
+        if attempts and attempts < WRITER_RETRIES:
+            self._attempts[endpoint] = attempts
+            self._queue.put(row)
+            return
+        if attempts:
+            kodi_log(f'CACHE: Write Queue dropped {endpoint} after {attempts} attempts\n{self._db_file}', 1)
+        self._attempts.pop(endpoint, None)
+        del self.pending[endpoint]
+
+    def _retire(self):
+        '''remove writer from registry if nothing left to write - put() happens under same lock so no rows are lost'''
+        with _writers_lock:
+            if not self._queue.empty():
+                return False
+            self.stopping = True
+            if _writers.get(self._db_file) is self:
+                del _writers[self._db_file]
+            return True
+
+    def run(self):
+        while True:
+            rows = self._get_batch()
+            if rows:
+                self._write_batch(rows)
+            elif self._retire():
+                break
+
+
+_writers = {}
+_writers_lock = Lock()
+
+
+def flush_writers():
+    '''block until every write-behind queue in this process is committed -- call before interpreter exits'''
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.flush()
+
+
+def _queue_db_cache(cache, endpoint, expires, data):
+    with _writers_lock:
+        writer = _writers.get(cache._db_file)
+        if not writer or writer.stopping:
+            writer = _writers[cache._db_file] = _CacheWriter(cache._db_file)
+            writer.start()
+        writer.put(cache, endpoint, expires, data)
 
 
 class SimpleCache(object):
@@ -38,15 +239,17 @@ class SimpleCache(object):
         self._monitor = Monitor()
         self._db_file = get_file_path(basefolder, filename, join_addon_data=basefolder == folder)
         self._sc_name = f'{folder}_{filename}_simplecache'
-        self._queue = []
         self._re_use_con = True
         self._connection = None
+        self._transaction_lock = Lock()
         self._memcache = get_setting('use_mem_cache')
+        self._writebehind = get_setting('cache_write_behind')
         self.check_cleanup()
         kodi_log("CACHE: Initialized")
 
     def close(self):
         '''tell any tasks to stop immediately (as we can be called multithreaded) and cleanup objects'''
+        self.flush()
         self._exit = True
         # wait for all tasks to complete
         while self._busy_tasks and not self._monitor.abortRequested():
@@ -55,13 +258,16 @@ class SimpleCache(object):
 
     def __del__(self):
         '''make sure close is called'''
-        if self._queue:
-            kodi_log(f'CACHE: Write {len(self._queue)} Items in Queue\n{self._sc_name}', 2)
-        for i in self._queue:
-            self._set_db_cache(*i)
-        self._queue = []
         self.close()
 
+    def flush(self):
+        '''wait for write-behind queue to be committed to database'''
+        writer = _writers.get(self._db_file)
+        if not writer or not writer.pending:
+            return
+        kodi_log(f'CACHE: Write {len(writer.pending)} Items in Queue\n{self._sc_name}', 2)
+        writer.flush()
+
     @contextmanager
     def busy_tasks(self, task_name):
         self._busy_tasks.append(task_name)
@@ -77,24 +283,128 @@ class SimpleCache(object):
         '''
         cur_time = set_timestamp(0, True)
         result = self._get_mem_cache(endpoint, cur_time)  # Try from memory first
-        return result or self._get_db_cache(endpoint, cur_time)  # Fallback to checking database if not in memory
+        result = result or self._get_queued_cache(endpoint, cur_time)  # Then rows waiting to be written
+        result = result or self._get_db_cache(endpoint, cur_time)  # Fallback to checking database if not in memory
+        return data_loads(result) if result else None  # Decode for each caller so callers can modify their copy
+
+    def get_many(self, endpoints):
+        '''
+            get multiple objects from cache and return a dictionary of {endpoint: result}
+            endpoints not in cache (or expired) are omitted from the results
+        '''
+        cur_time = set_timestamp(0, True)
+        results = {}
+        db_endpoints = []
+        for endpoint in endpoints:
+            result = self._get_mem_cache(endpoint, cur_time)
+            result = result or self._get_queued_cache(endpoint, cur_time)
+            if result:
+                results[endpoint] = result
+                continue
+            db_endpoints.append(endpoint)
+        if db_endpoints:
+            results.update(self._get_db_cache_many(db_endpoints, cur_time))
+        results = {k: data_loads(v) for k, v in results.items()}
+        return {k: v for k, v in results.items() if v}
 
     def set(self, endpoint, data, cache_days=30):
         """ set data in cache """
         with self.busy_tasks(f'set.{endpoint}'):
             expires = set_timestamp(cache_days * TIME_DAYS, True)
-            data = data_dumps(data, separators=(',', ':'))
-            self._set_mem_cache(endpoint, expires, data)
+            text = encode_text(data)
+            if text is None:
+                return
+            self._set_mem_cache(endpoint, expires, text)
+            data = compress_text(text)
+            if self._writebehind:
+                _queue_db_cache(self, endpoint, expires, data)
+                return
             self._set_db_cache(endpoint, expires, data)
 
+    def set_many(self, items):
+        """ set multiple items in cache in one transaction - items is dict of {endpoint: (data, cache_days)} """
+        if not items:
+            return
+        with self.busy_tasks(f'set_many.{len(items)}'):
+            rows = []
+            for endpoint, (data, cache_days) in items.items():
+                expires = set_timestamp(cache_days * TIME_DAYS, True)
+                text = encode_text(data)
+                if text is None:
+                    continue
+                self._set_mem_cache(endpoint, expires, text)
+                data = compress_text(text)
+                if self._writebehind:
+                    _queue_db_cache(self, endpoint, expires, data)
+                    continue
+                rows.append((endpoint, expires, data))
+            if rows:
+                self._set_db_cache_many(rows)
+
     def check_cleanup(self):
         '''check if cleanup is needed - public method, may be called by calling addon'''
         cur_time = set_timestamp(0, True)
         lastexecuted = self._win.getProperty(f'{self._sc_name}.clean.lastexecuted')
-        if not lastexecuted:
-            self._win.setProperty(f'{self._sc_name}.clean.lastexecuted', str(cur_time - self._auto_clean_interval + 600))
-        elif (int(lastexecuted) + self._auto_clean_interval) < cur_time:
-            self._do_cleanup()
+        if not lastexecuted:  # First check this session so load cleanup state from database
+            lastexecuted = self._get_meta('cleanup.lastexecuted') or str(cur_time - self._auto_clean_interval + 600)
+            self._win.setProperty(f'{self._sc_name}.clean.lastexecuted', lastexecuted)
+            self._win.setProperty(f'{self._sc_name}.clean.cutoff', self._get_meta('cleanup.cutoff') or '')
+        if (int(lastexecuted) + self._auto_clean_interval) < cur_time:
+            self._start_cleanup(cur_time)
+
+    def do_cleanup_slice(self, limit=CLEANUP_SLICE_ROWS):
+        '''
+            delete a bounded slice of expired rows for the cleanup sweep in progress
+            sweep cutoff is stored in database so it resumes after restart
+            returns True if there are more expired rows left to delete
+        '''
+        if self._exit or self._monitor.abortRequested():
+            return False
+        cutoff = self._win.getProperty(f'{self._sc_name}.clean.cutoff')
+        if not cutoff:
+            return False
+
+        with self.busy_tasks(__name__):
+            query = "SELECT id FROM simplecache WHERE expires < ? LIMIT ?"
+            cache_data = self._execute_sql(query, (int(cutoff), limit))
+            cache_ids = [i[0] for i in cache_data.fetchall()] if cache_data else []
+            if cache_ids:
+                self._clear_mem_cache(cache_ids)
+                query = f"DELETE FROM simplecache WHERE id IN ({','.join('?' * len(cache_ids))})"
+                self._execute_sql(query, tuple(cache_ids))
+                kodi_log(f'CACHE: Cleanup deleted {len(cache_ids)} expired items\n{self._sc_name}')
+            if len(cache_ids) >= limit:
+                return True
+            self._finish_cleanup()
+        return False
+
+    def _start_cleanup(self, cur_time):
+        '''schedule a cleanup sweep of items expired before cur_time'''
+        if self._win.getProperty(f'{self._sc_name}.clean.cutoff'):
+            return
+        kodi_log(f"CACHE: Scheduling cleanup...\n{self._sc_name}", 1)
+        self._set_meta('cleanup.cutoff', cur_time)
+        self._win.setProperty(f'{self._sc_name}.clean.cutoff', str(cur_time))
+
+    def _finish_cleanup(self):
+        '''release free pages back to disk and record sweep as complete'''
+        cur_time = set_timestamp(0, True)
+        self._execute_sql("PRAGMA incremental_vacuum")
+        self._set_meta('cleanup.lastexecuted', cur_time)
+        self._execute_sql("DELETE FROM simplecache_meta WHERE id = ?", ('cleanup.cutoff',))
+        self._win.setProperty(f'{self._sc_name}.clean.lastexecuted', str(cur_time))
+        self._win.clearProperty(f'{self._sc_name}.clean.cutoff')
+        kodi_log(f"CACHE: Cleanup complete...\n{self._sc_name}", 1)
+
+    def _get_meta(self, key):
+        '''get value from simplecache_meta table'''
+        cache_data = self._execute_sql("SELECT value FROM simplecache_meta WHERE id = ? LIMIT 1", (key,))
+        cache_data = cache_data.fetchone() if cache_data else None
+        return cache_data[0] if cache_data else None
+
+    def _set_meta(self, key, value):
+        '''set value in simplecache_meta table'''
+        self._execute_sql("INSERT OR REPLACE INTO simplecache_meta( id, value) VALUES (?, ?)", (key, f'{value}'))
 
     def _get_mem_cache(self, endpoint, cur_time):
         '''
@@ -116,9 +426,9 @@ class SimpleCache(object):
         if not data_propdata:
             return
 
-        return data_loads(data_propdata)
+        return data_propdata
 
-    def _set_mem_cache(self, endpoint, expires, data):
+    def _set_mem_cache(self, endpoint, expires, text):
         '''
             window property cache as alternative for memory cache
             usefull for (stateless) plugins
@@ -128,32 +438,89 @@ class SimpleCache(object):
         expr_endpoint = f'{self._sc_name}_expr_{endpoint}'
         data_endpoint = f'{self._sc_name}_data_{endpoint}'
         self._win.setProperty(expr_endpoint, str(expires))
-        self._win.setProperty(data_endpoint, data)
+        self._win.setProperty(data_endpoint, text)
+
+    def _clear_mem_cache(self, endpoints):
+        '''clear window property cache for list of endpoints'''
+        if not self._memcache:
+            return
+        for endpoint in endpoints:
+            self._win.clearProperty(f'{self._sc_name}_expr_{endpoint}')
+            self._win.clearProperty(f'{self._sc_name}_data_{endpoint}')
+
+    def _get_queued_cache(self, endpoint, cur_time):
+        '''get cache data from write-behind queue that has not been committed to database yet'''
+        writer = _writers.get(self._db_file)
+        if not writer:
+            return
+        expires, data = writer.pending.get(endpoint) or (0, None)
+        if not data or int(expires) <= cur_time:
+            return
+        return decompress_text(data)
 
     def _get_db_cache(self, endpoint, cur_time):
         '''get cache data from sqllite _database'''
         result = None
-        query = "SELECT expires, data, checksum FROM simplecache WHERE id = ? LIMIT 1"
+        query = "SELECT expires, data FROM simplecache WHERE id = ? LIMIT 1"
         cache_data = self._execute_sql(query, (endpoint,))
         if not cache_data:
             return
         cache_data = cache_data.fetchone()
         if not cache_data or int(cache_data[0]) <= cur_time:
             return
-        try:
-            data = str(zlib.decompress(cache_data[1]), 'utf-8')
-        except TypeError:
-            data = cache_data[1]
-        self._set_mem_cache(endpoint, cache_data[0], data)
-        result = data_loads(data)
+        result = decompress_text(cache_data[1])
+        if not result:
+            return
+        self._set_mem_cache(endpoint, cache_data[0], result)
         return result
 
+    def _get_db_cache_many(self, endpoints, cur_time):
+        '''get json payloads from sqllite _database using WHERE id IN (...) in chunks'''
+        results = {}
+        for x in range(0, len(endpoints), SQLITE_MAX_VARIABLES):
+            chunk = endpoints[x:x + SQLITE_MAX_VARIABLES]
+            query = f"SELECT id, expires, data FROM simplecache WHERE id IN ({','.join('?' * len(chunk))})"
+            cache_data = self._execute_sql(query, tuple(chunk))
+            if not cache_data:
+                continue
+            for endpoint, expires, data in cache_data.fetchall():
+                if int(expires) <= cur_time:
+                    continue
+                result = decompress_text(data)
+                if not result:
+                    continue
+                self._set_mem_cache(endpoint, expires, result)
+                results[endpoint] = result
+        return results
+
     def _set_db_cache(self, endpoint, expires, data):
-        ''' store cache data in _database '''
+        ''' store compressed cache data in _database '''
         query = "INSERT OR REPLACE INTO simplecache( id, expires, data, checksum) VALUES (?, ?, ?, ?)"
-        data = zlib.compress(bytes(data, 'utf-8'))
         self._execute_sql(query, (endpoint, expires, data, 0))
 
+    def _set_db_cache_many(self, rows):
+        ''' store list of (endpoint, expires, data) rows in _database using executemany in one transaction '''
+        query = "INSERT OR REPLACE INTO simplecache( id, expires, data, checksum) VALUES (?, ?, ?, ?)"
+        data = [(endpoint, expires, i, 0) for endpoint, expires, i in rows]
+        return self._execute_sql(query, data, transaction=True)
+
+    def do_auto_vacuum(self):
+        '''
+            once-off VACUUM so incremental auto_vacuum takes effect on database created before schema v1
+            locks database while running so only called by service once user is idle -- returns True if database was vacuumed
+        '''
+        if self._exit or self._monitor.abortRequested():
+            return False
+        with self.busy_tasks(__name__):
+            auto_vacuum = self._execute_sql("PRAGMA auto_vacuum")
+            auto_vacuum = auto_vacuum.fetchone() if auto_vacuum else None
+            if not auto_vacuum or auto_vacuum[0] == 2:
+                return False
+            kodi_log(f'CACHE: Enabling incremental auto_vacuum...\n{self._sc_name}', 1)
+            self._execute_sql("PRAGMA auto_vacuum=INCREMENTAL")
+            self._execute_sql("VACUUM")
+        return True
+
     def _do_delete(self):
         '''perform cleanup task'''
         if self._exit or self._monitor.abortRequested():
@@ -167,51 +534,41 @@ class SimpleCache(object):
 
             query = 'DELETE FROM simplecache'
             self._execute_sql(query)
-            self._execute_sql("VACUUM")
+            self._execute_sql("PRAGMA incremental_vacuum")
 
         # Washup
         self._win.setProperty(f'{self._sc_name}.clean.lastexecuted', str(cur_time))
         self._win.clearProperty(f'{self._sc_name}.cleanbusy')
         kodi_log(f'CACHE: Delete {self._sc_name} done')
 
-    def _do_cleanup(self, force=False):
-        '''perform cleanup task'''
-        if self._exit or self._monitor.abortRequested():
-            return
+    def _migrate_schema(self, connection, version):
+        # v1: index expires for cleanup sweeps, meta table for resumable cleanup
+        # incremental auto_vacuum needs a VACUUM of existing databases so it is left to service when idle -- see do_auto_vacuum()
+        if version < 1:
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_expires ON simplecache(expires)")
+            connection.execute("CREATE TABLE IF NOT EXISTS simplecache_meta(id TEXT UNIQUE, value TEXT)")
+            connection.execute("PRAGMA user_version=1")
 
-        with self.busy_tasks(__name__):
-            cur_time = set_timestamp(0, True)
-            kodi_log(f"CACHE: Running cleanup...\n{self._sc_name}", 1)
-            if self._win.getProperty(f'{self._sc_name}.cleanbusy'):
-                return
-            self._win.setProperty(f'{self._sc_name}.cleanbusy', "busy")
-
-            query = "SELECT id, expires FROM simplecache"
-            for cache_data in self._execute_sql(query).fetchall():
-                cache_id = cache_data[0]
-                cache_expires = cache_data[1]
-                if self._exit or self._monitor.abortRequested():
-                    return
-                # always cleanup all memory objects on each interval
-                self._win.clearProperty(cache_id)
-                # clean up db cache object only if expired
-                if force or int(cache_expires) < cur_time:
-                    query = 'DELETE FROM simplecache WHERE id = ?'
-                    self._execute_sql(query, (cache_id,))
-                    kodi_log(f'CACHE: delete from db {cache_id}')
-
-            # compact db
-            self._execute_sql("VACUUM")
-
-        # Washup
-        self._win.setProperty(f'{self._sc_name}.clean.lastexecuted', str(cur_time))
-        self._win.clearProperty(f'{self._sc_name}.cleanbusy')
-        kodi_log(f"CACHE: Cleanup complete...\n{self._sc_name}", 1)
+    def _set_schema(self, connection, retries=10):
+        '''migrate existing database to current schema version -- retries while another process holds lock'''
+        try:
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version < DATABASE_SCHEMA:
+                kodi_log(f'CACHE: Migrating schema v{version} to v{DATABASE_SCHEMA}: {self._db_file}...', 1)
+                self._migrate_schema(connection, version)
+        except sqlite3.OperationalError as error:
+            if 'locked' in f'{error}' and retries > 0 and not self._monitor.abortRequested():
+                self._monitor.waitForAbort(0.5)
+                return self._set_schema(connection, retries - 1)
+            kodi_log(f'CACHE: Exception while migrating _database: {error}', 1)
+        except Exception as error:
+            kodi_log(f'CACHE: Exception while migrating _database: {error}', 1)
 
     def _set_pragmas(self, connection):
         if not self._connection:
             connection.execute("PRAGMA synchronous=NORMAL")
             connection.execute("PRAGMA journal_mode=WAL")
+            self._set_schema(connection)
         if self._re_use_con:
             self._connection = connection
         return connection
@@ -230,6 +587,7 @@ class SimpleCache(object):
             try:
                 kodi_log(f'CACHE: Initialising: {self._db_file}...', 1)
                 connection = self._connection or sqlite3.connect(self._db_file, timeout=5, isolation_level=None, check_same_thread=not self._re_use_con)
+                connection.execute("PRAGMA auto_vacuum=INCREMENTAL")  # Must be set before creating tables
                 connection.execute(
                     """CREATE TABLE IF NOT EXISTS simplecache(
                     id TEXT UNIQUE, expires INTEGER, data TEXT, checksum INTEGER)""")
@@ -243,18 +601,32 @@ class SimpleCache(object):
                 self._monitor.waitForAbort(1)
                 return self._get_database(attempts)
 
-    def _execute_sql(self, query, data=None):
+    def _execute_transaction(self, _database, query, data):
+        '''run executemany inside a single BEGIN/COMMIT - lock so other threads on shared connection dont nest'''
+        with self._transaction_lock:
+            _database.execute("BEGIN")
+            try:
+                result = _database.executemany(query, data)
+            except Exception:
+                _database.execute("ROLLBACK")
+                raise
+            _database.execute("COMMIT")
+            return result
+
+    def _execute_sql(self, query, data=None, transaction=False):
         '''little wrapper around execute and executemany to just retry a db command if db is locked'''
         retries = 10
         result = None
         error = ''
         # always use new db object because we need to be sure that data is available for other simplecache instances
         with self._get_database() as _database:
-            while retries > 0 and not self._monitor.abortRequested():
+            while retries > 0 and (transaction or not self._monitor.abortRequested()):  # Allow batched writes to flush on abort
                 if self._exit:
                     return None
                 try:
-                    if isinstance(data, list):
+                    if transaction:
+                        result = self._execute_transaction(_database, query, data)
+                    elif isinstance(data, list):
                         result = _database.executemany(query, data)
                     elif data:
                         result = _database.execute(query, data)
@@ -276,3 +648,46 @@ class SimpleCache(object):
                     break
             kodi_log(f'CACHE: _database ERROR ! -- {error}', 1)
         return None
+
+
+class SimpleCacheCleanup(object):
+    '''run cleanup sweeps in small slices across every cache database -- called by service when idle'''
+
+    def __init__(self, folder=None):
+        folder = folder or DATABASE_NAME
+        basefolder = get_setting('cache_location', 'str') or ''
+        basefolder = f'{basefolder}{folder}'
+        self._folder = folder
+        self._db_path = get_write_path(basefolder, join_addon_data=basefolder == folder)
+        self._caches = None
+        self._vacuum_checked = set()
+
+    def ret_caches(self):
+        if self._caches is None:
+            self._caches = [SimpleCache(self._folder, i) for i in get_files_in_folder(self._db_path, r'.*\.db$')]
+        return self._caches
+
+    def do_cleanup_slice(self):
+        '''run one cleanup slice on first database with sweep in progress - returns True if more work to do'''
+        for cache in self.ret_caches():
+            cache.check_cleanup()
+            if cache.do_cleanup_slice():
+                return True
+        return False
+
+    @staticmethod
+    def is_user_idle():
+        '''no input for VACUUM_IDLE_TIME and nothing playing so blocking database reads won't be noticed'''
+        return getGlobalIdleTime() >= VACUUM_IDLE_TIME and not Player().isPlaying()
+
+    def do_vacuum_slice(self):
+        '''convert one database per call to incremental auto_vacuum - returns True if a database was vacuumed'''
+        if not self.is_user_idle():
+            return False
+        for cache in self.ret_caches():
+            if cache._db_file in self._vacuum_checked:
+                continue
+            self._vacuum_checked.add(cache._db_file)
+            if cache.do_auto_vacuum():
+                return True
+        return False
@@ -45,6 +45,7 @@ class ItemBuilder(_ArtworkSelector):
         self.ftv_api = ftv_api or FanartTV()
         self.trakt_api = trakt_api
         self._cache = BasicCache(filename='ItemBuilder.db')
+        self._precache = {}
         self._regex = re.compile(r'({})'.format('|'.join(IMAGEPATH_ALL)))
         self.parent_params = None
         self.cache_only = cache_only
@@ -168,13 +169,48 @@ class ItemBuilder(_ArtworkSelector):
         language = self.tmdb_api.language
         return f'{language}.{tmdb_type}.{tmdb_id}.{season}.{episode}'
 
+    def get_item_ids(self, li):
+        mediatype = li.infolabels.get('mediatype')
+        tmdb_type = li.get_tmdb_type()
+        tmdb_id = li.unique_ids.get('tvshow.tmdb') if mediatype in ['season', 'episode'] else li.unique_ids.get('tmdb')
+        season = li.infolabels.get('season', 0) if mediatype in ['season', 'episode'] else None
+        episode = li.infolabels.get('episode') if mediatype == 'episode' else None
+        return (tmdb_type, tmdb_id, season, episode)
+
+    def precache_items(self, items):
+        """ Retrieve cached items and their parents for a list of item dicts in a single cache lookup """
+        names = set()
+        for i in items:
+            if not i or 'next_page' in i:
+                continue
+            tmdb_type, tmdb_id, season, episode = self.get_item_ids(ListItem(**i))
+            if not tmdb_type or not tmdb_id:
+                continue
+            names.add(self.get_cache_name(tmdb_type, tmdb_id, season, episode))
+            if season is None:
+                continue
+            names.add(self.get_cache_name(tmdb_type, tmdb_id))
+            if episode is None:
+                continue
+            names.add(self.get_cache_name(tmdb_type, tmdb_id, season))
+        if not names:
+            return
+        self._precache = self._cache.get_cache_many(names) or {}
+
+    def _get_cache(self, name):
+        return self._precache.pop(name, None) or self._cache.get_cache(name)  # Pop so each caller gets its own copy
+
+    def _set_cache(self, item, name):
+        self._precache.pop(name, None)  # Remove stale precached item as we are updating it
+        return self._cache.set_cache(item, name, cache_days=CACHE_DAYS)
+
     def get_item(self, tmdb_type, tmdb_id, season=None, episode=None, cache_refresh=False):
         if not tmdb_type or not tmdb_id:
             return
 
         # Get cached item
         name = self.get_cache_name(tmdb_type, tmdb_id, season, episode)
-        item = None if cache_refresh else self._cache.get_cache(name)
+        item = None if cache_refresh else self._get_cache(name)
         if self.cache_only:
             return item
 
@@ -186,7 +222,7 @@ class ItemBuilder(_ArtworkSelector):
                 base_name_season = season
             parent = self.parent_tv if base_name_season is None else self.parent_season
             base_name = self.get_cache_name(tmdb_type, tmdb_id, base_name_season)
-            base_item = parent or self._cache.get_cache(base_name)
+            base_item = parent or self._get_cache(base_name)
 
         # Check that our current item hasn't expired and needs refreshing
         if item and get_timestamp(item['expires']):  # Our item hasn't expired
@@ -199,7 +235,7 @@ class ItemBuilder(_ArtworkSelector):
                 # Else we've got current item details but we need to grab some artwork or remap quality
                 prefix = 'tvshow.' if season is not None and episode is None else ''  # Seasons should map tvshow art with prefix
                 item = self.get_artwork(item, tmdb_type, season, episode, base_item, prefix=prefix)  # Get art and map it
-                return self._cache.set_cache(item, name, cache_days=CACHE_DAYS)  # Re-add our item to the cache with new details
+                return self._set_cache(item, name)  # Re-add our item to the cache with new details
 
         # Item isn't current so it needs a refresh but let's make sure we keep manually set artwork
         prefix = ''
@@ -226,7 +262,7 @@ class ItemBuilder(_ArtworkSelector):
             item_queue = pt.queue
         ftv_art = item_queue[0] if item_queue else None
         item = self.get_artwork(item, tmdb_type, season, episode, base_item, prefix=prefix, ftv_art=ftv_art)
-        return self._cache.set_cache(item, name, cache_days=CACHE_DAYS)
+        return self._set_cache(item, name)
 
     def get_item_artwork(self, artwork, art_dict=None, is_season=False):
         def set_artwork(details=None, blacklist=[]):
@@ -258,17 +294,14 @@ class ItemBuilder(_ArtworkSelector):
                 k: v for k, v in item['listitem']['infoproperties'].items()
                 if not re.match(r'.*\.[0-9]*\..*', k)}  # Filter out indexed properties to leave only basic props
             name = self.get_cache_name(tmdb_type, tmdb_id, season, episode)
-            self._cache.set_cache(item, name, cache_days=CACHE_DAYS)  # Set back to cache
+            self._set_cache(item, name)  # Set back to cache
         item['listitem']['infoproperties'] = item['infoproperties_basic']  # Set filtered ip to ip
         return item
 
     def get_listitem(self, i, use_iterprops=True):
         li = ListItem(parent_params=self.parent_params, **i)
         mediatype = li.infolabels.get('mediatype')
-        tmdb_type = li.get_tmdb_type()
-        tmdb_id = li.unique_ids.get('tvshow.tmdb') if mediatype in ['season', 'episode'] else li.unique_ids.get('tmdb')
-        season = li.infolabels.get('season', 0) if mediatype in ['season', 'episode'] else None
-        episode = li.infolabels.get('episode') if mediatype == 'episode' else None
+        tmdb_type, tmdb_id, season, episode = self.get_item_ids(li)
         item = self.get_item(tmdb_type, tmdb_id, season, episode)
         if not item or 'listitem' not in item:
             return li
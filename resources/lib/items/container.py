@@ -6,9 +6,6 @@ from resources.lib.addon.thread import ParallelThread
 from resources.lib.api.tmdb.api import TMDb
 from resources.lib.api.trakt.api import TraktAPI
 from resources.lib.api.fanarttv.api import FanartTV
-from resources.lib.api.omdb.api import OMDb
-from resources.lib.api.tvdb.api import TVDb
-from resources.lib.api.mdblist.api import MDbList
 from resources.lib.items.trakt import TraktMethods
 from resources.lib.items.builder import ItemBuilder
 from resources.lib.items.filters import is_excluded
@@ -17,6 +14,9 @@ from threading import Thread
 
 """ Lazyimports
 from resources.lib.items.kodi import KodiDb
+from resources.lib.api.omdb.api import OMDb
+from resources.lib.api.tvdb.api import TVDb
+from resources.lib.api.mdblist.api import MDbList
 """
 
 
@@ -58,11 +58,8 @@ class Container():
 
         # API class initialisation
         self.tmdb_api = TMDb()
-        self.omdb_api = OMDb() if get_setting('omdb_apikey', 'str') else None
         self.ftv_api = FanartTV(cache_only=self.ftv_is_cache_only(), )
         self.trakt_api = TraktAPI()
-        self.mdblist_api = MDbList()
-        self.tvdb_api = TVDb()
         self.ib = ItemBuilder(
             tmdb_api=self.tmdb_api, ftv_api=self.ftv_api, trakt_api=self.trakt_api,
             log_timers=self.log_timers, timer_lists=self.timer_lists)
@@ -81,6 +78,34 @@ class Container():
         self.pagination = self.pagination_is_allowed()
         self.thumb_override = 0
 
+    @property
+    def omdb_api(self):
+        """ Only construct OMDb client (and import module) if route uses it """
+        try:
+            return self._omdb_api
+        except AttributeError:
+            from resources.lib.api.omdb.api import OMDb
+            self._omdb_api = OMDb() if get_setting('omdb_apikey', 'str') else None
+            return self._omdb_api
+
+    @property
+    def mdblist_api(self):
+        try:
+            return self._mdblist_api
+        except AttributeError:
+            from resources.lib.api.mdblist.api import MDbList
+            self._mdblist_api = MDbList()
+            return self._mdblist_api
+
+    @property
+    def tvdb_api(self):
+        try:
+            return self._tvdb_api
+        except AttributeError:
+            from resources.lib.api.tvdb.api import TVDb
+            self._tvdb_api = TVDb()
+            return self._tvdb_api
+
     def pagination_is_allowed(self):
         if self.params.get('nextpage', '').lower() == 'false':
             return False
@@ -176,6 +201,7 @@ class Container():
         self.ib.cache_only = self.tmdb_cache_only
         with TimerList(self.timer_lists, '--build', log_threshold=0.05, logging=self.log_timers):
             self.ib.parent_params = self.parent_params
+            self.ib.precache_items(items)  # Single cache lookup for all items before building in threads
             with ParallelThread(items, self._build_item) as pt:
                 item_queue = pt.queue
             all_listitems = [i for i in item_queue if i]
@@ -184,6 +210,11 @@ class Container():
         with TimerList(self.timer_lists, '--sync', log_threshold=0.05, logging=self.log_timers):
             self._pre_sync.join()
 
+        # Get details for all items found in Kodi library in batched JSON-RPC calls
+        with TimerList(self.timer_lists, '--kodi', log_threshold=0.05, logging=self.log_timers):
+            if self.kodi_db:
+                self.kodi_db.precache_kodi_details(all_listitems)
+
         # Finalise listitems in parallel threads
         with TimerList(self.timer_lists, '--make', log_threshold=0.05, logging=self.log_timers):
             self.format_episode_labels = self.parent_params.get('info') not in NO_LABEL_FORMATTING
@@ -1,48 +1,111 @@
 from resources.lib.api.mapping import set_show, get_empty_item
-from resources.lib.api.kodi.rpc import get_kodi_library, get_movie_details, get_tvshow_details, get_episode_details, get_season_details
+from resources.lib.api.kodi.rpc import (
+    KodiLibrary, get_kodi_library, get_library_items_batch, get_item_details_batch,
+    get_movie_details, get_tvshow_details, get_episode_details, get_season_details)
+
+
+DETAILS_FUNCS = {
+    'movie': get_movie_details,
+    'tvshow': get_tvshow_details,
+    'season': get_season_details,
+    'episode': get_episode_details}
 
 
 class KodiDb():
     def __init__(self, tmdb_type):
         self.kodi_db_tv = {}
         self.kodi_db = get_kodi_library(tmdb_type)
+        self.kodi_details = {}  # (dbtype, dbid): details retrieved in batches by precache_kodi_details()
 
-    def get_kodi_details(self, li):
-        """ Pass through listitem to get Kodi details """
+    def _get_dbid(self, li):
+        """ Get dbid for movie / tvshow """
+        return self.kodi_db.get_info(
+            info='dbid',
+            imdb_id=li.unique_ids.get('imdb'),
+            tmdb_id=li.unique_ids.get('tmdb'),
+            tvdb_id=li.unique_ids.get('tvdb'),
+            originaltitle=li.infolabels.get('originaltitle'),
+            title=li.infolabels.get('title'),
+            year=li.infolabels.get('year'))
 
-        def _get_dbid():
-            """ Get dbid for movie / tvshow """
-            return self.kodi_db.get_info(
-                info='dbid',
-                imdb_id=li.unique_ids.get('imdb'),
-                tmdb_id=li.unique_ids.get('tmdb'),
-                tvdb_id=li.unique_ids.get('tvdb'),
-                originaltitle=li.infolabels.get('originaltitle'),
-                title=li.infolabels.get('title'),
-                year=li.infolabels.get('year'))
-
-        def _get_tvshow_dbid():
-            """ Get dbid for parent tvshow """
-            return self.kodi_db.get_info(
-                info='dbid',
-                imdb_id=li.unique_ids.get('tvshow.imdb'),
-                tmdb_id=li.unique_ids.get('tvshow.tmdb'),
-                tvdb_id=li.unique_ids.get('tvshow.tvdb'),
-                title=li.infolabels.get('tvshowtitle'))
+    def _get_tvshow_dbid(self, li):
+        """ Get dbid for parent tvshow """
+        return self.kodi_db.get_info(
+            info='dbid',
+            imdb_id=li.unique_ids.get('tvshow.imdb'),
+            tmdb_id=li.unique_ids.get('tvshow.tmdb'),
+            tvdb_id=li.unique_ids.get('tvshow.tvdb'),
+            title=li.infolabels.get('tvshowtitle'))
 
-        def _get_child_details():
-            season, episode = li.infolabels.get('season'), li.infolabels.get('episode')
+    def _get_child_library(self, li):
+        """ Returns season or episode library type for item """
+        return 'episode' if li.infolabels.get('episode') is not None else 'season'
 
-            library, func = 'season', get_season_details
-            if episode is not None:
-                library, func = 'episode', get_episode_details
+    def _get_child_dbid(self, li, library, dbid):
+        try:
+            kodi_db_tv = self.kodi_db_tv[(library, dbid)]
+        except KeyError:
+            kodi_db_tv = self.kodi_db_tv[(library, dbid)] = get_kodi_library(library, dbid)
+        if not kodi_db_tv:
+            return
+        return kodi_db_tv.get_info('dbid', season=li.infolabels.get('season'), episode=li.infolabels.get('episode'))
+
+    def _get_details(self, dbtype, dbid, pop=False):
+        """ Get details prefetched by precache_kodi_details() otherwise get them individually """
+        try:
+            return self.kodi_details.pop((dbtype, dbid)) if pop else self.kodi_details[(dbtype, dbid)]
+        except KeyError:
+            return DETAILS_FUNCS[dbtype](dbid)
 
-            kodi_db_tv = self.kodi_db_tv.setdefault(dbid, get_kodi_library(library, dbid))
-            child_dbid = kodi_db_tv.get_info('dbid', season=season, episode=episode)
+    def precache_kodi_details(self, listitems):
+        """ Match all listitems to library dbids then get details for them in batched JSON-RPC calls """
+        if not self.kodi_db:
+            return
+        items = []
+        for li in listitems:
+            try:
+                mediatype = li.infolabels['mediatype']
+            except (AttributeError, KeyError):
+                continue
+            if mediatype in ('movie', 'tvshow'):
+                items.append((li, mediatype, self._get_dbid(li)))
+            elif mediatype in ('season', 'episode'):
+                items.append((li, self._get_child_library(li), self._get_tvshow_dbid(li)))
+
+        # Get season and episode libraries of all parent tvshows in one batch
+        tvshow_dbids = {}
+        for li, dbtype, dbid in items:
+            if dbid and dbtype in ('season', 'episode') and (dbtype, dbid) not in self.kodi_db_tv:
+                tvshow_dbids.setdefault(dbtype, set()).add(dbid)
+        for library, dbids in tvshow_dbids.items():
+            for dbid, database in get_library_items_batch(library, list(dbids)).items():
+                self.kodi_db_tv[(library, dbid)] = KodiLibrary(dbtype=library, tvshowid=dbid, database=database)
+
+        # Get details of all items in one batch per dbtype
+        dbids = {}
+        for li, dbtype, dbid in items:
+            if not dbid:
+                continue
+            if dbtype in ('movie', 'tvshow'):
+                dbids.setdefault(dbtype, set()).add(dbid)
+                continue
+            dbids.setdefault('tvshow', set()).add(dbid)
+            child_dbid = self._get_child_dbid(li, dbtype, dbid)
+            if child_dbid:
+                dbids.setdefault(dbtype, set()).add(child_dbid)
+        for dbtype, i in dbids.items():
+            i = [x for x in i if (dbtype, x) not in self.kodi_details]
+            self.kodi_details.update({(dbtype, k): v for k, v in get_item_details_batch(dbtype, i).items()})
+
+    def get_kodi_details(self, li):
+        """ Pass through listitem to get Kodi details """
+
+        def _get_child_details():
+            library = self._get_child_library(li)
+            child_dbid = self._get_child_dbid(li, library, dbid)
             if not child_dbid:
                 return
-
-            details = func(child_dbid)
+            details = self._get_details(library, child_dbid, pop=True)  # Pop because set_show() modifies details
             details['infoproperties']['tvshow.dbid'] = dbid
             return details
 
@@ -51,23 +114,23 @@ class KodiDb():
 
         routes = {
             'movie': {
-                'get_dbid': _get_dbid,
-                'get_details': get_movie_details},
+                'get_dbid': self._get_dbid,
+                'get_details': lambda x: self._get_details('movie', x)},
             'tvshow': {
-                'get_dbid': _get_dbid,
-                'get_details': get_tvshow_details},
+                'get_dbid': self._get_dbid,
+                'get_details': lambda x: self._get_details('tvshow', x)},
             'season': {
-                'get_dbid': _get_tvshow_dbid,
-                'get_details': lambda x: set_show(_get_child_details() or get_empty_item(), get_tvshow_details(x))},
+                'get_dbid': self._get_tvshow_dbid,
+                'get_details': lambda x: set_show(_get_child_details() or get_empty_item(), self._get_details('tvshow', x))},
             'episode': {
-                'get_dbid': _get_tvshow_dbid,
-                'get_details': lambda x: set_show(_get_child_details() or get_empty_item(), get_tvshow_details(x))}}
+                'get_dbid': self._get_tvshow_dbid,
+                'get_details': lambda x: set_show(_get_child_details() or get_empty_item(), self._get_details('tvshow', x))}}
         try:
             route = routes[li.infolabels['mediatype']]
         except KeyError:
             return
 
-        dbid = route['get_dbid']()
+        dbid = route['get_dbid'](li)
         if not dbid:
             return
         return route['get_details'](dbid)
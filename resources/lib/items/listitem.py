@@ -1,9 +1,9 @@
-from xbmcgui import ListItem as KodiListItem
 from tmdbhelper.parser import try_int, merge_two_dicts
 from resources.lib.addon.consts import ACCEPTED_MEDIATYPES, PARAM_WIDGETS_RELOAD
 from resources.lib.addon.plugin import ADDONPATH, PLUGINPATH, convert_media_type, get_setting, get_condvisibility, get_localized, encode_url
 from resources.lib.addon.tmdate import is_unaired_timestamp
 from resources.lib.addon.logger import kodi_log
+from resources.lib.items.remote import make_listitem
 
 """ Lazyimports
 from resources.lib.items.context import ContextMenu
@@ -185,31 +185,19 @@ class _ListItem(object):
             return url
         return _get_url(self.path, **self.params)
 
-    def get_listitem(self, offscreen=True):
+    def get_listitem_data(self):
+        """ Returns dictionary of KodiListItem attributes that can be passed to make_listitem() """
         if self.infolabels.get('mediatype') not in ACCEPTED_MEDIATYPES:
             self.infolabels.pop('mediatype', None)
         self.infolabels['path'] = self.get_url()
-        listitem = KodiListItem(label=self.label, label2=self.label2, path=self.infolabels['path'], offscreen=offscreen)
-        listitem.setLabel2(self.label2)
-        listitem.setInfo(self.library, self.infolabels)
-        listitem.setArt(self.set_art_fallbacks())
-        listitem.setProperties(self.infoproperties)
-        listitem.addContextMenuItems(self.context_menu)
-        if self.library == 'pictures':  # Exit early as adding cast to pictures causes issues
-            return listitem
-        listitem.setUniqueIDs(self.unique_ids)
-        listitem.setCast(self.cast)
-
-        if not self.stream_details:
-            return listitem
-        for k, v in self.stream_details.items():
-            if not k or not v:
-                continue
-            for i in v:
-                if not i:
-                    continue
-                listitem.addStreamInfo(k, i)
-        return listitem
+        return {
+            'label': self.label, 'label2': self.label2, 'path': self.infolabels['path'], 'library': self.library,
+            'infolabels': self.infolabels, 'art': self.set_art_fallbacks(), 'infoproperties': self.infoproperties,
+            'context_menu': self.context_menu, 'unique_ids': self.unique_ids, 'cast': self.cast,
+            'stream_details': self.stream_details}
+
+    def get_listitem(self, offscreen=True):
+        return make_listitem(offscreen=offscreen, **self.get_listitem_data())
 
 
 class _NextPage(_ListItem):
@@ -0,0 +1,136 @@
+import socket
+from json import dumps, loads
+from struct import pack, unpack
+from xbmcgui import Window, ListItem as KodiListItem
+
+""" Lazyimports
+from xbmc import executebuiltin, getCondVisibility
+from xbmcplugin import addDirectoryItems, setProperty, setPluginCategory, setContent, endOfDirectory, addSortMethod
+"""
+
+
+WORKER_PORT_PROPERTY = 'TMDbHelper.DirectoryWorker.Port'
+WORKER_TOKEN_PROPERTY = 'TMDbHelper.DirectoryWorker.Token'  # Per-session secret so only Kodi processes can use the worker
+WORKER_CONNECT_TIMEOUT = 1
+WORKER_RESPONSE_TIMEOUT = 120
+WORKER_REQUEST_MAX_BYTES = 65536  # Requests only carry a paramstring so larger messages are refused
+WORKER_EXCLUDED_INFO = ('play', 'related')
+WORKER_DIALOG_INFO = {  # Routes which can open dialogs so must run in plugin -- value is param which skips dialog if set
+    'search': 'query',
+    'trakt_searchlists': 'query',
+    'mdblist_searchlists': 'query',
+    'dir_discover': None,
+    'user_discover': None}
+WORKER_DIALOG_PREFIXES = ('mdblist_', )  # MDBList shows a dialog when API returns an error
+
+
+def send_message(sock, data):
+    """ Send length-prefixed JSON message """
+    data = dumps(data, separators=(',', ':'), default=str).encode('utf-8')
+    sock.sendall(pack('>I', len(data)) + data)
+
+
+def _recv_exactly(sock, length):
+    data = bytearray()
+    while len(data) < length:
+        chunk = sock.recv(min(length - len(data), 65536))
+        if not chunk:
+            raise ConnectionError('Connection closed before message was received')
+        data.extend(chunk)
+    return bytes(data)
+
+
+def recv_message(sock, max_length=None):
+    """ Receive length-prefixed JSON message. Raises ValueError if message is longer than max_length """
+    length, = unpack('>I', _recv_exactly(sock, 4))
+    if max_length and length > max_length:
+        raise ValueError(f'Message length {length} exceeds {max_length}')
+    return loads(_recv_exactly(sock, length).decode('utf-8'))
+
+
+def make_listitem(
+        label='', label2='', path='', library='video', infolabels=None, art=None, infoproperties=None,
+        context_menu=None, unique_ids=None, cast=None, stream_details=None, offscreen=True):
+    """ Make a KodiListItem from the dictionary returned by ListItem.get_listitem_data() """
+    listitem = KodiListItem(label=label, label2=label2, path=path, offscreen=offscreen)
+    listitem.setLabel2(label2)
+    listitem.setInfo(library, infolabels or {})
+    listitem.setArt(art or {})
+    listitem.setProperties(infoproperties or {})
+    listitem.addContextMenuItems([tuple(i) for i in context_menu or []])
+    if library == 'pictures':  # Exit early as adding cast to pictures causes issues
+        return listitem
+    listitem.setUniqueIDs(unique_ids or {})
+    listitem.setCast(cast or [])
+
+    if not stream_details:
+        return listitem
+    for k, v in stream_details.items():
+        if not k or not v:
+            continue
+        for i in v:
+            if not i:
+                continue
+            listitem.addStreamInfo(k, i)
+    return listitem
+
+
+def is_worker_excluded(params):
+    """ Routes which play items or can open dialogs are built by plugin rather than waiting on worker in service """
+    info = params.get('info') or ''
+    if info in WORKER_EXCLUDED_INFO or info.startswith(WORKER_DIALOG_PREFIXES):
+        return True
+    if info not in WORKER_DIALOG_INFO:
+        return False
+    return not WORKER_DIALOG_INFO[info] or not params.get(WORKER_DIALOG_INFO[info])
+
+
+def get_remote_directory(handle, paramstring):
+    """
+    Ask the directory worker in the service to build the plugin:// directory
+    Returns True if the worker handled the request, otherwise caller should build the directory locally
+    """
+    try:
+        port = int(Window(10000).getProperty(WORKER_PORT_PROPERTY))
+    except ValueError:
+        return False
+    token = Window(10000).getProperty(WORKER_TOKEN_PROPERTY)
+    if not token:
+        return False
+
+    from urllib.parse import parse_qsl
+    if is_worker_excluded(dict(parse_qsl(paramstring))):
+        return False
+
+    from xbmc import getCondVisibility
+    if getCondVisibility("Window.IsVisible(script-skinshortcuts.xml)"):
+        return False  # Items are configured differently for skinshortcuts so build locally
+
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=WORKER_CONNECT_TIMEOUT) as sock:
+            sock.settimeout(WORKER_RESPONSE_TIMEOUT)
+            send_message(sock, {'paramstring': paramstring, 'token': token})
+            response = recv_message(sock)
+    except (OSError, ValueError):
+        return False
+
+    if response.get('error'):
+        return False
+    if not response.get('items'):
+        return True  # Worker built the directory but it was empty so nothing to add
+
+    from xbmc import executebuiltin
+    from xbmcplugin import addDirectoryItems, setProperty, setPluginCategory, setContent, endOfDirectory, addSortMethod
+    for k, v in response.get('properties', {}).items():
+        setProperty(handle, k, v)
+    addDirectoryItems(handle, [(url, make_listitem(**data), is_folder) for url, data, is_folder in response['items']])
+    setPluginCategory(handle, response.get('plugin_category') or '')
+    setContent(handle, response.get('container_content') or '')
+    for i in response.get('sort_methods') or []:
+        addSortMethod(handle, **i)
+    endOfDirectory(handle, updateListing=response.get('update_listing') or False)
+    if response.get('container_update'):
+        executebuiltin(f'Container.Update({response["container_update"]})')
+    if response.get('container_refresh'):
+        executebuiltin('Container.Refresh')
+    return True
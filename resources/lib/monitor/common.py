@@ -1,4 +1,4 @@
-from resources.lib.addon.window import get_property
+from resources.lib.addon.window import PropertyWriter
 from resources.lib.api.tmdb.api import TMDb
 from resources.lib.api.omdb.api import OMDb
 from resources.lib.api.tvdb.api import TVDb
@@ -38,6 +38,9 @@ SETPROP_RATINGS = {
     'total_awards_nominated', 'awards_nominated', 'awards_nominated_cr', 'academy_awards_nominated',
     'goldenglobe_awards_nominated', 'mtv_awards_nominated', 'criticschoice_awards_nominated',
     'emmy_awards_nominated', 'sag_awards_nominated', 'bafta_awards_nominated'}
+SETPROP_EXTERNAL = {
+    'CropImage', 'CropImage.Original', 'BlurImage', 'BlurImage.Original',
+    'DesaturateImage', 'DesaturateImage.Original', 'Colors'}  # Written by ImageFunctions outside of PropertyWriter
 
 
 TVDB_AWARDS_KEYS = {
@@ -72,18 +75,23 @@ class CommonMonitorFunctions(object):
             self.all_awards = {'movie': {}, 'tv': {}}
             kodi_log('ERROR: Failed to load awards data!')
 
+    @property
+    def property_writer(self):
+        try:
+            if self._property_writer.prefix == f'TMDbHelper.{self.property_prefix}':
+                return self._property_writer
+        except AttributeError:
+            pass
+        self._property_writer = PropertyWriter(self.property_prefix, external=SETPROP_EXTERNAL)
+        return self._property_writer
+
     @kodi_try_except('lib.monitor.common clear_property')
     def clear_property(self, key):
-        key = f'{self.property_prefix}.{key}'
-        get_property(key, clear_property=True)
+        self.property_writer.set(key, None)
 
     @kodi_try_except('lib.monitor.common set_property')
     def set_property(self, key, value):
-        key = f'{self.property_prefix}.{key}'
-        if value is None:
-            get_property(key, clear_property=True)
-        else:
-            get_property(key, set_property=f'{value}')
+        self.property_writer.set(key, value)
 
     def set_iter_properties(self, dictionary: dict, keys: set):
         """ Interates through a set of keys and adds corresponding value from the dictionary as a window property
@@ -92,6 +100,7 @@ class CommonMonitorFunctions(object):
         """
         if not isinstance(dictionary, dict):
             dictionary = {}
+        properties = {}
         for k in keys:
             try:
                 v = dictionary.get(k, None)
@@ -101,28 +110,25 @@ class CommonMonitorFunctions(object):
                     except Exception as exc:
                         kodi_traceback(exc, f'\nlib.monitor.common set_iter_properties\nk: {k} v: {v}')
                 self.properties.add(k)
-                self.set_property(k, v)
+                properties[k] = v
             except Exception as exc:
                 kodi_traceback(exc, f'\nlib.monitor.common set_iter_properties\nk: {k}')
+        self.property_writer.set_many(properties)
 
     def set_indexed_properties(self, dictionary):
         if not isinstance(dictionary, dict):
             return
 
-        index_properties = set()
+        properties = {}
         for k, v in dictionary.items():
             if k in self.properties or k in SETPROP_RATINGS or k in SETMAIN_ARTWORK:
                 continue
-            try:
-                v = v or ''
-                self.set_property(k, v)
-                index_properties.add(k)
-            except Exception as exc:
-                kodi_traceback(exc, f'\nlib.monitor.common set_indexed_properties\nk: {k} v: {v}')
+            properties[k] = v or ''
 
-        for k in (self.index_properties - index_properties):
-            self.clear_property(k)
-        self.index_properties = index_properties.copy()
+        for k in (self.index_properties - set(properties)):
+            properties[k] = None
+        self.property_writer.set_many(properties)
+        self.index_properties = {k for k, v in properties.items() if v is not None}
 
     @kodi_try_except('lib.monitor.common set_list_properties')
     def set_list_properties(self, items, key, prop):
@@ -138,10 +144,11 @@ class CommonMonitorFunctions(object):
         minutes = duration // 60 % 60
         hours = duration // 60 // 60
         totalmin = duration // 60
-        self.set_property('Duration', totalmin)
-        self.set_property('Duration_H', hours)
-        self.set_property('Duration_M', minutes)
-        self.set_property('Duration_HHMM', f'{hours:02d}:{minutes:02d}')
+        self.property_writer.set_many({
+            'Duration': totalmin,
+            'Duration_H': hours,
+            'Duration_M': minutes,
+            'Duration_HHMM': f'{hours:02d}:{minutes:02d}'})
         self.properties.update(['Duration', 'Duration_H', 'Duration_M', 'Duration_HHMM'])
 
     @kodi_try_except('lib.monitor.common set_date_properties')
@@ -149,30 +156,33 @@ class CommonMonitorFunctions(object):
         date_obj = convert_timestamp(premiered, time_fmt="%Y-%m-%d", time_lim=10)
         if not date_obj:
             return
-        self.set_property('Premiered', get_region_date(date_obj, 'dateshort'))
-        self.set_property('Premiered_Long', get_region_date(date_obj, 'datelong'))
-        self.set_property('Premiered_Custom', date_obj.strftime(get_infolabel('Skin.String(TMDbHelper.Date.Format)') or '%d %b %Y'))
+        self.property_writer.set_many({
+            'Premiered': get_region_date(date_obj, 'dateshort'),
+            'Premiered_Long': get_region_date(date_obj, 'datelong'),
+            'Premiered_Custom': date_obj.strftime(get_infolabel('Skin.String(TMDbHelper.Date.Format)') or '%d %b %Y')})
         self.properties.update(['Premiered', 'Premiered_Long', 'Premiered_Custom'])
 
     def set_properties(self, item):
-        self.set_iter_properties(item, SETMAIN)
-        self.set_iter_properties(item.get('infolabels', {}), SETINFO)
-        self.set_iter_properties(item.get('infoproperties', {}), SETPROP)
-        self.set_time_properties(item.get('infolabels', {}).get('duration', 0))
-        self.set_date_properties(item.get('infolabels', {}).get('premiered'))
-        self.set_list_properties(item.get('cast', []), 'name', 'cast')
-        if get_condvisibility("!Skin.HasSetting(TMDbHelper.DisableExtendedProperties)"):
-            self.set_indexed_properties(item.get('infoproperties', {}))
+        with self.property_writer.batch():  # Publish all changed keys for item together
+            self.set_iter_properties(item, SETMAIN)
+            self.set_iter_properties(item.get('infolabels', {}), SETINFO)
+            self.set_iter_properties(item.get('infoproperties', {}), SETPROP)
+            self.set_time_properties(item.get('infolabels', {}).get('duration', 0))
+            self.set_date_properties(item.get('infolabels', {}).get('premiered'))
+            self.set_list_properties(item.get('cast', []), 'name', 'cast')
+            if get_condvisibility("!Skin.HasSetting(TMDbHelper.DisableExtendedProperties)"):
+                self.set_indexed_properties(item.get('infoproperties', {}))
 
     @kodi_try_except('lib.monitor.common get_tmdb_id')
-    def get_tmdb_id(self, tmdb_type, imdb_id=None, query=None, year=None, episode_year=None):
+    def get_tmdb_id(self, tmdb_type, imdb_id=None, query=None, year=None, episode_year=None, tmdb_api=None):
+        tmdb_api = tmdb_api or self.tmdb_api
         if imdb_id and imdb_id.startswith('tt'):
-            return self.tmdb_api.get_tmdb_id(tmdb_type=tmdb_type, imdb_id=imdb_id)
-        return self.tmdb_api.get_tmdb_id(tmdb_type=tmdb_type, query=query, year=year, episode_year=episode_year)
+            return tmdb_api.get_tmdb_id(tmdb_type=tmdb_type, imdb_id=imdb_id)
+        return tmdb_api.get_tmdb_id(tmdb_type=tmdb_type, query=query, year=year, episode_year=episode_year)
 
     @kodi_try_except('lib.monitor.common get_tmdb_id')
-    def get_tmdb_id_multi(self, media_type=None, imdb_id=None, query=None, year=None, episode_year=None):
-        multi_i = self.tmdb_api.get_tmdb_multisearch(query=query, media_type=media_type) or {}
+    def get_tmdb_id_multi(self, media_type=None, imdb_id=None, query=None, year=None, episode_year=None, tmdb_api=None):
+        multi_i = (tmdb_api or self.tmdb_api).get_tmdb_multisearch(query=query, media_type=media_type) or {}
         return (multi_i.get('id'), multi_i.get('media_type'),)
 
     def get_trakt_ratings(self, item, trakt_type, season=None, episode=None):
@@ -246,13 +256,9 @@ class CommonMonitorFunctions(object):
             self.cur_item = 0
             self.pre_item = 1
         ignore_keys = ignore_keys or set()
-        for k in self.properties - ignore_keys:
-            self.clear_property(k)
+        self.property_writer.clear_many((self.properties - ignore_keys) | self.index_properties)
         self.properties = set()
-        for k in self.index_properties:
-            self.clear_property(k)
         self.index_properties = set()
 
     def clear_property_list(self, properties):
-        for k in properties:
-            self.clear_property(k)
+        self.property_writer.clear_many(properties)
@@ -14,11 +14,13 @@ def clean_old_databases():
 
 def mem_cache_kodidb(notification=True):
     from resources.lib.api.kodi.rpc import KodiLibrary
+    from resources.lib.api.kodi.snapshot import request_refresh
     from resources.lib.addon.logger import TimerFunc
     from xbmcgui import Dialog
     with TimerFunc('KodiLibrary sync took', inline=True):
-        KodiLibrary('movie', cache_refresh=True)
-        KodiLibrary('tvshow', cache_refresh=True)
+        for dbtype in ('movie', 'tvshow'):
+            KodiLibrary(dbtype, cache_refresh=True)
+        request_refresh()  # Snapshots are owned by LibraryMonitor in service so ask it to refresh them
         if notification:
             Dialog().notification('TMDbHelper', 'Kodi Library cached to memory', icon=f'{ADDONPATH}/icon.png')
 
@@ -32,8 +34,7 @@ class CronJobMonitor(Thread):
         self.xbmc_monitor = Monitor()
 
     def run(self):
-        clean_old_databases()
-        mem_cache_kodidb(notification=False)
+        clean_old_databases()  # KodiLibrary snapshot is refreshed by LibraryMonitor on service start
 
         self.xbmc_monitor.waitForAbort(600)  # Wait 10 minutes before doing updates to give boot time
         if self.xbmc_monitor.abortRequested():
@@ -7,20 +7,28 @@ from resources.lib.addon.window import get_property
 from resources.lib.addon.plugin import get_infolabel, get_setting, ADDONDATA
 from tmdbhelper.parser import try_int, try_float
 from resources.lib.files.futils import make_path
-from threading import Thread
+from threading import Thread, Lock
+from collections import OrderedDict
+from contextlib import contextmanager
 import urllib.request as urllib
 from resources.lib.addon.logger import kodi_log
 
 # PIL causes issues (via numpy) on Linux systems using python versions higher than 3.8.5
 # Lazy import PIL to avoid using it unless user requires ImageFunctions
-ImageFilter, Image = None, None
+ImageFilter, ImageStat, Image = None, None, None
+
+DECODED_CACHE_SIZE = 2  # Sources with reduced images kept so functions applied to same artwork share one decode
+THUMB_SIZE = (256, 256)  # Size of reduced image used for blur and colors
+
+_decoded = OrderedDict()  # source: DecodedImage
+_decoded_lock = Lock()
 
 
 def lazyimport_pil(func):
     def wrapper(*args, **kwargs):
-        global ImageFilter
+        global ImageFilter, ImageStat
         if ImageFilter is None:
-            from PIL import ImageFilter
+            from PIL import ImageFilter, ImageStat
         return func(*args, **kwargs)
     return wrapper
 
@@ -93,6 +101,71 @@ def _openimage(image, targetpath, filename):
     return ''
 
 
+class DecodedImage(object):
+    """
+    Source artwork decoded at full size for callers of use_full() and at most once at reduced size
+    Full image is shared by callers using it at the same time and released when the last one is done
+    Reduced image is taken from full image if in use, otherwise JPEGs are decoded at reduced scale with draft()
+    Images are shared between threads so callers must not modify them in place
+    """
+    def __init__(self, source, targetpath, filename):
+        self.source = source
+        self.targetpath = targetpath
+        self.filename = filename
+        self._full = None
+        self._full_users = 0
+        self._thumb = None
+        self._lock = Lock()
+
+    def _open(self):
+        img = _openimage(self.source, self.targetpath, self.filename)
+        if not img:
+            raise IOError(f'Could not open {self.source}')
+        return img
+
+    @contextmanager
+    def use_full(self):
+        with self._lock:
+            if self._full is None:
+                img = self._open()
+                img.load()
+                self._full = img
+            self._full_users += 1
+            img = self._full
+        try:
+            yield img
+        finally:
+            with self._lock:
+                self._full_users -= 1
+                if not self._full_users:
+                    self._full = None
+
+    def get_thumb(self):
+        with self._lock:
+            if self._thumb is None:
+                if self._full is None:
+                    img = self._open()
+                    img.draft('RGB', THUMB_SIZE)
+                else:
+                    img = self._full.copy()
+                img.thumbnail(THUMB_SIZE)
+                self._thumb = img.convert('RGB')
+            return self._thumb
+
+
+def get_decoded(source, targetpath, filename):
+    """ Get shared DecodedImage for source. Only the most recent DECODED_CACHE_SIZE sources are kept """
+    with _decoded_lock:
+        try:
+            _decoded.move_to_end(source)
+            return _decoded[source]
+        except KeyError:
+            decoded = _decoded[source] = DecodedImage(source, targetpath, filename)
+        while len(_decoded) > DECODED_CACHE_SIZE:
+            _decoded.popitem(last=False)
+        return decoded
+
+
 def _saveimage(image, targetfile):
     """ Save image object to disk
     Uses flush() and os.fsync() to ensure file is written to disk before continuing
@@ -157,10 +230,9 @@ class ImageFunctions(Thread):
             if xbmcvfs.exists(destination):
                 os.utime(destination, None)
             else:
-                img = _openimage(source, self.save_path, filename)
-                img = img.crop(img.convert('RGBa').getbbox())
+                with get_decoded(source, self.save_path, filename).use_full() as img:
+                    img = img.crop(img.convert('RGBa').getbbox())
                 _saveimage(img, destination)
-                img.close()
 
             return destination
 
@@ -175,12 +247,9 @@ class ImageFunctions(Thread):
             if xbmcvfs.exists(destination):
                 os.utime(destination, None)
             else:
-                img = _openimage(source, self.save_path, filename)
-                img.thumbnail((256, 256))
-                img = img.convert('RGB')
+                img = get_decoded(source, self.save_path, filename).get_thumb()
                 img = img.filter(ImageFilter.GaussianBlur(self.radius))
                 _saveimage(img, destination)
-                img.close()
 
             return destination
 
@@ -195,10 +264,9 @@ class ImageFunctions(Thread):
             if xbmcvfs.exists(destination):
                 os.utime(destination, None)
             else:
-                img = _openimage(source, self.save_path, filename)
-                img = img.convert('LA')
+                with get_decoded(source, self.save_path, filename).use_full() as img:
+                    img = img.convert('LA')
                 _saveimage(img, destination)
-                img.close()
 
             return destination
 
@@ -207,12 +275,7 @@ class ImageFunctions(Thread):
 
     def get_maincolor(self, img):
         """Returns main color of image as list of rgb values 0:255"""
-        rgb_list = [None, None, None]
-        for channel in range(3):
-            pixels = img.getdata(band=channel)
-            values = [pixel for pixel in pixels]
-            rgb_list[channel] = self.clamp(sum(values) / len(values))
-        return rgb_list
+        return [self.clamp(i) for i in ImageStat.Stat(img).mean[:3]]
 
     def get_compcolor(self, r, g, b, shift=0.33):
         """
@@ -281,10 +344,9 @@ class ImageFunctions(Thread):
             if xbmcvfs.exists(destination):
                 os.utime(destination, None)
                 img = _imageopen(xbmcvfs.translatePath(destination))
+                img.load()
             else:
-                img = _openimage(source, self.save_path, filename)
-                img.thumbnail((256, 256))
-                img = img.convert('RGB')
+                img = get_decoded(source, self.save_path, filename).get_thumb()
                 _saveimage(img, destination)
 
             maincolor_rgb = self.get_maincolor(img)
@@ -314,9 +376,33 @@ class ImageFunctions(Thread):
                     compcolor_propname, compcolor_propvalu, compcolor_hex, compcolor_propchek])
                 thread_compcolor.start()
 
-            img.close()
             return maincolor_hex
 
         except Exception as exc:
             kodi_log(exc, 1)
             return ''
+
+
+def benchmark_images(source, methods=('crop', 'blur', 'desaturate', 'colors'), repeats=5):
+    """ Time image functions on source with nothing decoded or saved beforehand. Returns {method: seconds} averages """
+    import shutil
+    import tempfile
+    from timeit import default_timer as timer
+    results = {i: 0.0 for i in (*methods, 'total')}
+    for _ in range(repeats):
+        with _decoded_lock:
+            _decoded.clear()
+        save_path = f'{tempfile.mkdtemp()}/'
+        try:
+            for method in methods:
+                get_property('Benchmark.Colors.Main', clear_property=True)  # Avoid starting colour gradient threads
+                get_property('Benchmark.Colors.Comp', clear_property=True)
+                image_functions = ImageFunctions(method=method, is_thread=False, prefix='Benchmark')
+                image_functions.save_path = save_path
+                timer_start = timer()
+                getattr(image_functions, method)(source)
+                results[method] += timer() - timer_start
+        finally:
+            shutil.rmtree(save_path, ignore_errors=True)
+    results['total'] = sum(results[i] for i in methods)
+    return {k: v / repeats for k, v in results.items()}
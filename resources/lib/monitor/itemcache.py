@@ -0,0 +1,116 @@
+import zlib
+from threading import Lock
+from collections import OrderedDict
+from resources.lib.addon.consts import CACHE_SHORT
+from resources.lib.addon.logger import kodi_log
+from resources.lib.files.futils import json_dumps as data_dumps
+from resources.lib.files.futils import json_loads as data_loads
+
+""" Lazyimports
+import os
+from resources.lib.addon.tmdate import set_timestamp
+from resources.lib.files.futils import get_file_path
+"""
+
+
+ITEMCACHE_MAX_ITEMS = 500  # Most recently used items kept in memory
+ITEMCACHE_MAX_BYTES = 8 * 1024 * 1024  # Approximate serialised size of items kept in memory
+ITEMCACHE_FOLDER = 'itemcache'
+ITEMCACHE_VERSION = 1  # Increment if format of snapshot changes
+ITEMCACHE_EXPIRES = CACHE_SHORT * 24 * 60 * 60  # Seconds items in snapshot stay valid so restarts don't show stale details
+
+
+class ItemDetailsCache(object):
+    """
+    Bounded LRU of ItemDetails for ListItemMonitor evicted by item count and approximate serialised size
+    Snapshot of items is saved on service exit and loaded again at start so revisits are answered without lookups
+    """
+    def __init__(self, factory, filename, max_items=ITEMCACHE_MAX_ITEMS, max_bytes=ITEMCACHE_MAX_BYTES):
+        self._factory = factory  # Callable to rebuild item from tuple of values stored in snapshot
+        self._filename = filename
+        self._max_items = max_items
+        self._max_bytes = max_bytes
+        self._items = OrderedDict()  # name: (item, size, timestamp)
+        self._bytes = 0
+        self._lock = Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, name):
+        with self._lock:
+            try:
+                item = self._items[name][0]
+            except KeyError:
+                self.stats['misses'] += 1
+                return
+            self._items.move_to_end(name)
+            self.stats['hits'] += 1
+            return item
+
+    def set(self, name, item, size=None, timestamp=None):
+        if timestamp is None:
+            from resources.lib.addon.tmdate import set_timestamp
+            timestamp = set_timestamp(0, True)
+        size = size or self._get_size(item)
+        with self._lock:
+            self._pop(name)
+            self._items[name] = (item, size, timestamp)
+            self._bytes += size
+            while len(self._items) > 1 and (len(self._items) > self._max_items or self._bytes > self._max_bytes):
+                self._pop(next(iter(self._items)))
+                self.stats['evictions'] += 1
+
+    @staticmethod
+    def _get_size(item):
+        try:
+            return len(data_dumps(tuple(item)))
+        except (TypeError, ValueError):
+            return len(f'{item}')
+
+    def _pop(self, name):
+        try:
+            self._bytes -= self._items.pop(name)[1]
+        except KeyError:
+            pass
+
+    def get_stats(self):
+        return dict(self.stats, items=len(self._items), bytes=self._bytes)
+
+    def save(self):
+        """ Write items in least to most recently used order as compressed JSON """
+        import os
+        from resources.lib.files.futils import get_file_path
+        with self._lock:
+            data = [[k, v[2], list(v[0])] for k, v in self._items.items()]
+        path = get_file_path(ITEMCACHE_FOLDER, self._filename)
+        try:
+            with open(f'{path}.tmp', 'wb') as file:
+                file.write(zlib.compress(data_dumps({'version': ITEMCACHE_VERSION, 'items': data}).encode('utf-8')))
+            os.replace(f'{path}.tmp', path)
+        except (OSError, TypeError, ValueError) as exc:
+            kodi_log(f'ItemDetailsCache {self._filename} save FAILED!\n{exc}', 1)
+            return
+        kodi_log(f'ItemDetailsCache saved {len(data)} items {self.get_stats()}', 2)
+
+    def load(self):
+        """ Read snapshot and add items which have not expired """
+        from resources.lib.addon.tmdate import set_timestamp
+        from resources.lib.files.futils import get_file_path
+        try:
+            with open(get_file_path(ITEMCACHE_FOLDER, self._filename), 'rb') as file:
+                data = data_loads(zlib.decompress(file.read()).decode('utf-8'))
+        except (OSError, zlib.error, UnicodeDecodeError):
+            return
+        if not data or data.get('version') != ITEMCACHE_VERSION:
+            return
+        timestamp_min = set_timestamp(0, True) - ITEMCACHE_EXPIRES
+        for name, timestamp, values in data.get('items') or []:
+            if timestamp < timestamp_min:
+                continue
+            try:
+                self.set(name, self._factory(*values), timestamp=timestamp)
+            except TypeError:
+                continue
+        kodi_log(f'ItemDetailsCache loaded {len(self._items)} items', 2)
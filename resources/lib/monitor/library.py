@@ -0,0 +1,110 @@
+from xbmc import Monitor
+from threading import Thread, Lock
+from resources.lib.addon.logger import kodi_log
+from resources.lib.addon.window import get_property
+from resources.lib.api.kodi.snapshot import LibrarySnapshot, SNAPSHOT_DBTYPES, SNAPSHOT_REFRESH_PROPERTY
+
+""" Lazyimports
+from json import loads
+"""
+
+
+LIBRARY_QUIET_TIME = 2  # Seconds without notifications before applying queued changes
+LIBRARY_MAX_CHANGES = 200  # Refresh whole snapshot instead of querying items one by one when more changes than this are queued
+
+
+class _LibraryNotifications(Monitor):
+    def __init__(self, on_notification):
+        Monitor.__init__(self)
+        self._on_notification = on_notification
+
+    def onNotification(self, sender, method, data):
+        if not method.startswith('VideoLibrary.'):
+            return
+        self._on_notification(method, data)
+
+
+class LibraryMonitor(Thread):
+    """
+    Keeps KodiLibrary snapshots for movies and tvshows current by applying per dbid changes from library notifications
+    Only this thread writes snapshots -- other processes request a full refresh with snapshot.request_refresh()
+    """
+    def __init__(self):
+        Thread.__init__(self)
+        self.exit = False
+        self.snapshots = {i: LibrarySnapshot(i) for i in SNAPSHOT_DBTYPES}
+        self.xbmc_monitor = _LibraryNotifications(self.on_notification)
+        self._lock = Lock()
+        self._changes = {}  # (dbtype, dbid): is_removed
+        self._quiet_time = 0
+
+    def on_notification(self, method, data):
+        if method in ('VideoLibrary.OnScanFinished', 'VideoLibrary.OnCleanFinished'):
+            self._quiet_time = 0  # Apply queued changes now
+            return
+        if method not in ('VideoLibrary.OnUpdate', 'VideoLibrary.OnRemove'):
+            return
+        try:
+            from json import loads
+            data = loads(data) or {}
+            item = data.get('item') or data
+            dbtype, dbid = item['type'], int(item['id'])
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return
+        if dbtype not in self.snapshots:
+            return
+        with self._lock:
+            self._changes[(dbtype, dbid)] = method == 'VideoLibrary.OnRemove'
+            self._quiet_time = LIBRARY_QUIET_TIME
+
+    def apply_changes(self):
+        with self._lock:
+            changes, self._changes = self._changes, {}
+
+        refresh = {dbtype for (dbtype, dbid) in changes} if len(changes) > LIBRARY_MAX_CHANGES else set()
+        updated = set()
+        for (dbtype, dbid), is_removed in changes.items():
+            if dbtype in refresh:
+                continue
+            snapshot = self.snapshots[dbtype]
+            if snapshot.remove(dbid) if is_removed else snapshot.update(dbid):
+                updated.add(dbtype)
+
+        for dbtype in refresh:
+            self.snapshots[dbtype].refresh()
+        for dbtype in updated:
+            self.snapshots[dbtype].save()
+        if refresh or updated:
+            kodi_log(f'KodiLibrary snapshot applied {len(changes)} changes', 2)
+
+    def refresh(self):
+        """ Replace snapshots with full library query -- queued changes are included so are discarded """
+        with self._lock:
+            self._changes = {}
+        for snapshot in self.snapshots.values():
+            snapshot.refresh()
+        kodi_log('KodiLibrary snapshot refreshed on request', 2)
+
+    def poller(self):
+        while not self.xbmc_monitor.abortRequested() and not self.exit:
+            self.xbmc_monitor.waitForAbort(1)
+            if get_property(SNAPSHOT_REFRESH_PROPERTY):
+                self.refresh()
+                get_property(SNAPSHOT_REFRESH_PROPERTY, clear_property=True)
+                continue
+            if not self._changes:
+                continue
+            if self._quiet_time > 0:
+                self._quiet_time -= 1
+                continue
+            self.apply_changes()
+
+    def run(self):
+        for snapshot in self.snapshots.values():
+            snapshot.refresh()
+        self.poller()
+        if not self.xbmc_monitor.abortRequested():
+            for snapshot in self.snapshots.values():
+                snapshot.clear()
+            get_property(SNAPSHOT_REFRESH_PROPERTY, clear_property=True)
+        del self.xbmc_monitor
@@ -3,12 +3,16 @@ from resources.lib.api.kodi.rpc import get_person_stats
 from resources.lib.addon.window import get_property
 from resources.lib.monitor.common import CommonMonitorFunctions, SETMAIN_ARTWORK, SETPROP_RATINGS
 from resources.lib.monitor.images import ImageFunctions
+from resources.lib.monitor.itemcache import ItemDetailsCache
+from resources.lib.monitor.prefetch import ListItemPrefetch, get_prefetch_offsets
 from resources.lib.addon.plugin import convert_media_type, convert_type, get_setting, get_infolabel, get_condvisibility, get_localized
 from resources.lib.addon.logger import kodi_try_except
 from resources.lib.files.bcache import BasicCache
+from resources.lib.items.builder import ItemBuilder
 from resources.lib.items.listitem import ListItem
 from resources.lib.addon.tmdate import convert_timestamp, get_region_date
 from resources.lib.api.mapping import get_empty_item
+from tmdbhelper.parser import try_int
 from threading import Thread
 from copy import deepcopy
 from collections import namedtuple
@@ -44,8 +48,16 @@ class ListItemMonitor(CommonMonitorFunctions):
         self._cache = BasicCache(filename=f'QuickService.db')
         self._ignored_labels = ['..', get_localized(33078)]
         self._listcontainer = None
-        self._itemcache = {}
+        self._itemcache = ItemDetailsCache(ItemDetails, 'ListItemMonitor.json.z')
+        self._itemcache.load()
         self._last_listitem = None
+        self._prefetch = None
+        self._prefetch_enabled = get_setting('service_prefetch')
+        self._prefetch_position = None
+        self._prefetch_ib = None  # Prefetch thread has its own builder and API instances so it never shares state with service thread
+        self._prefetch_ftv_api = None
+        self._service_enabled = False  # Skin.HasSetting(TMDbHelper.Service) from last get_listitem
+        self._ftv_lookup = False  # service_fanarttv_lookup setting from last get_listitem
 
     def get_container(self):
 
@@ -67,7 +79,9 @@ class ListItemMonitor(CommonMonitorFunctions):
         self.container = _get_container()
         self.container_item = _get_container_item()
 
-    def get_infolabel(self, infolabel):
+    def get_infolabel(self, infolabel, offset=0):
+        if offset:
+            return get_infolabel(f'{self.container}ListItem({offset}).{infolabel}')
         return get_infolabel(f'{self.container_item}{infolabel}')
 
     def get_position(self):
@@ -130,17 +144,17 @@ class ListItemMonitor(CommonMonitorFunctions):
         self.season = self.get_season()
         self.episode = self.get_episode()
 
-    def get_cur_item(self):
+    def get_cur_item(self, offset=0):
         return (
             'current_item',
-            self.get_infolabel('dbtype'),
-            self.get_infolabel('dbid'),
-            self.get_infolabel('IMDBNumber'),
-            self.get_infolabel('label'),
-            self.get_infolabel('tvshowtitle'),
-            self.get_infolabel('year'),
-            self.get_infolabel('season'),
-            self.get_infolabel('episode'),)
+            self.get_infolabel('dbtype', offset),
+            self.get_infolabel('dbid', offset),
+            self.get_infolabel('IMDBNumber', offset),
+            self.get_infolabel('label', offset),
+            self.get_infolabel('tvshowtitle', offset),
+            self.get_infolabel('year', offset),
+            self.get_infolabel('season', offset),
+            self.get_infolabel('episode', offset),)
 
     def is_same_item(self, update=False):
         self.cur_item = self.get_cur_item()
@@ -217,6 +231,8 @@ class ListItemMonitor(CommonMonitorFunctions):
             return
         if self.is_same_item():
             return
+        if self._service_enabled:
+            self.queue_prefetch()
         ignore_keys = None
         if self.dbtype in ['episodes', 'seasons']:
             ignore_keys = SETMAIN_ARTWORK
@@ -308,35 +324,118 @@ class ListItemMonitor(CommonMonitorFunctions):
             return images
 
     def get_itemtypeid(self, tmdb_type):
-        imdb_id = self.imdb_id if not self.season else None  # Cant tell if IMDb ID is show or season/episode so skip
-        li_year = self.year if tmdb_type == 'movie' else None
-        ep_year = self.year if tmdb_type == 'tv' else None
+        is_multi = tmdb_type == 'multi'
+        tmdb_type, tmdb_id = self._get_itemtypeid(
+            tmdb_type, self.imdb_id, self.query, self.year, self.season,
+            is_tvshow_child=bool(self.get_infolabel('episode') or self.get_infolabel('season')))
+        if is_multi:
+            self.dbtype = convert_type(tmdb_type, 'dbtype')
+        return (tmdb_type, tmdb_id)
+
+    def _get_itemtypeid(self, tmdb_type, imdb_id=None, query=None, year=None, season=None, is_tvshow_child=False, tmdb_api=None):
+        imdb_id = imdb_id if not season else None  # Cant tell if IMDb ID is show or season/episode so skip
+        li_year = year if tmdb_type == 'movie' else None
+        ep_year = year if tmdb_type == 'tv' else None
 
         if tmdb_type == 'multi':
             tmdb_id, tmdb_type = self.get_tmdb_id_multi(
-                media_type='tv' if self.get_infolabel('episode') or self.get_infolabel('season') else None,
-                query=self.query, imdb_id=imdb_id, year=li_year, episode_year=ep_year)
-            self.dbtype = convert_type(tmdb_type, 'dbtype')
+                media_type='tv' if is_tvshow_child else None,
+                query=query, imdb_id=imdb_id, year=li_year, episode_year=ep_year, tmdb_api=tmdb_api)
             return (tmdb_type, tmdb_id)
 
-        tmdb_id = self.get_tmdb_id(tmdb_type=tmdb_type, query=self.query, imdb_id=imdb_id, year=li_year, episode_year=ep_year)
+        tmdb_id = self.get_tmdb_id(
+            tmdb_type=tmdb_type, query=query, imdb_id=imdb_id, year=li_year, episode_year=ep_year, tmdb_api=tmdb_api)
         return (tmdb_type, tmdb_id)
 
-    def get_itemdetails_quick(self, tmdb_type=None, tmdb_id=None, season=None, episode=None):
+    def get_prefetch_item(self, offset):
+        """ Get identity of neighbouring item at offset from focused item for prefetch worker """
+        cur_item = self.get_cur_item(offset)
+        if not any(cur_item[1:]) or cur_item[4] in self._ignored_labels:
+            return
+        if self.get_infolabel('Property(tmdb_type)', offset) == 'person':
+            dbtype = 'actors'
+        elif cur_item[1]:
+            dbtype = f'{cur_item[1]}s'
+        else:
+            dbtype = self.dbtype  # Items in same container share fallback type of focused item
+        tmdb_type = self.get_tmdb_type(dbtype)
+        if not tmdb_type:
+            return
+        return {
+            'cache_name': str(cur_item),
+            'tmdb_type': tmdb_type,
+            'imdb_id': cur_item[3] if cur_item[3].startswith('tt') else '',
+            'query': cur_item[5] or self.get_infolabel('Title', offset) or cur_item[4],
+            'year': cur_item[6],
+            'season': cur_item[7] if dbtype == 'episodes' else None,
+            'episode': cur_item[8] if dbtype == 'episodes' else None,
+            'is_tvshow_child': bool(cur_item[7] or cur_item[8]),
+            'ftv_lookup': self._ftv_lookup}
+
+    def get_prefetch_ib(self):
+        """ ItemBuilder for prefetch worker thread -- created in that thread on first use """
+        if self._prefetch_ib is None:
+            from resources.lib.api.tmdb.api import TMDb
+            from resources.lib.api.trakt.api import TraktAPI
+            from resources.lib.api.fanarttv.api import FanartTV
+            self._prefetch_ftv_api = FanartTV()
+            self._prefetch_ib = ItemBuilder(tmdb_api=TMDb(), ftv_api=self._prefetch_ftv_api, trakt_api=TraktAPI())
+        return self._prefetch_ib
+
+    def prefetch_itemdetails(self, item):
+        """ Lookup and cache item details for neighbouring item -- runs in prefetch worker thread """
+        ib = self.get_prefetch_ib()
+        ib.ftv_api = self._prefetch_ftv_api if item['ftv_lookup'] else None
+        cache_item = self._cache.get_cache(item['cache_name'])
+        if not cache_item:
+            tmdb_type, tmdb_id = self._get_itemtypeid(
+                item['tmdb_type'], item['imdb_id'], item['query'], item['year'], item['season'], item['is_tvshow_child'],
+                tmdb_api=ib.tmdb_api)
+            if not tmdb_type or not tmdb_id:
+                return
+            cache_item = self._cache.set_cache({'tmdb_type': tmdb_type, 'tmdb_id': tmdb_id}, item['cache_name'])
+        self.get_itemdetails_quick(**cache_item, season=item['season'], episode=item['episode'], ib=ib)
+
+    def queue_prefetch(self):
+        """ Queue neighbouring items in scroll direction for prefetch worker """
+        if not self._prefetch_enabled or self.container_item != f'{self.container}ListItem.':
+            return
+        position = try_int(self.get_position(), fallback=None)
+        direction = position - self._prefetch_position if position is not None and self._prefetch_position is not None else 1
+        self._prefetch_position = position
+        if not self._prefetch:
+            self._prefetch = ListItemPrefetch(self.prefetch_itemdetails)
+            self._prefetch.setName('Prefetch Thread')
+            self._prefetch.start()
+        items = [self.get_prefetch_item(i) for i in get_prefetch_offsets(direction)]
+        self._prefetch.put([i for i in items if i])
+
+    def cancel_prefetch(self, exit=False):
+        self._prefetch_position = None
+        if not self._prefetch:
+            return
+        self._prefetch.cancel()
+        self._prefetch.exit = exit
+
+    def save_itemcache(self):
+        """ Snapshot item details so next service start answers revisits without lookups """
+        self._itemcache.save()
+
+    def get_itemdetails_quick(self, tmdb_type=None, tmdb_id=None, season=None, episode=None, ib=None):
         if not tmdb_type or not tmdb_id:
             return
         cache_name = f'{tmdb_type}.{tmdb_id}.{season}.{episode}'
         cache_item = self._itemcache.get(cache_name)
         if cache_item:
             return cache_item
-        details = self.ib.get_item(tmdb_type, tmdb_id, season, episode)
+        details = (ib or self.ib).get_item(tmdb_type, tmdb_id, season, episode)
         if not details:
             return
         try:
             itemdetails = ItemDetails(tmdb_type, tmdb_id, details['listitem'], details['artwork'])
         except (KeyError, AttributeError, TypeError):
             return
-        self._itemcache[cache_name] = itemdetails
+        self._itemcache.set(cache_name, itemdetails)
         return itemdetails
 
     def get_itemdetails(self):
@@ -446,12 +545,12 @@ class ListItemMonitor(CommonMonitorFunctions):
                 itemdetails.listitem, itemdetails.tmdb_type, itemdetails.tmdb_id, listitem]).start()
 
         else:
-            self.set_properties(itemdetails.listitem)
-            ignore_keys = prev_properties.intersection(self.properties)
-            ignore_keys.update(SETPROP_RATINGS)
-            ignore_keys.update(SETMAIN_ARTWORK)
-            for k in prev_properties - ignore_keys:
-                self.clear_property(k)
+            with self.property_writer.batch():  # Changed keys and stale keys are published together
+                self.set_properties(itemdetails.listitem)
+                ignore_keys = prev_properties.intersection(self.properties)
+                ignore_keys.update(SETPROP_RATINGS)
+                ignore_keys.update(SETMAIN_ARTWORK)
+                self.clear_property_list(prev_properties - ignore_keys)
 
         get_property('IsUpdating', clear_property=True)
 
@@ -496,6 +595,7 @@ class ListItemMonitor(CommonMonitorFunctions):
 
         # Clear properties for clean slate if user opened a new directory
         if not self.is_same_folder(update=True):
+            self.cancel_prefetch()
             self.clear_properties()
 
         # Get the current listitem details for the details lookup
@@ -506,11 +606,16 @@ class ListItemMonitor(CommonMonitorFunctions):
             Thread(target=self.run_imagefuncs).start()
 
         # Allow early exit if the skin only needs image manipulations
-        if get_condvisibility("!Skin.HasSetting(TMDbHelper.Service)"):
+        self._service_enabled = get_condvisibility("Skin.HasSetting(TMDbHelper.Service)")
+        if not self._service_enabled:
             return get_property('IsUpdating', clear_property=True)
 
         # Check ftv setting so item builder can skip artwork lookups if unneeded
-        self.ib.ftv_api = self.ftv_api if get_setting('service_fanarttv_lookup') else None
+        self._ftv_lookup = get_setting('service_fanarttv_lookup')
+        self.ib.ftv_api = self.ftv_api if self._ftv_lookup else None
+
+        # Start looking up neighbouring items in background while we lookup focused item
+        self.queue_prefetch()
 
         # Lookup item and exit early if failed (when using win props method)
         itemdetails = self.get_itemdetails()
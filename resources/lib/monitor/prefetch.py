@@ -0,0 +1,57 @@
+from xbmc import Monitor
+from threading import Thread, Lock, Event
+from resources.lib.addon.logger import kodi_traceback
+
+
+PREFETCH_AHEAD = 3  # Neighbouring items to prefetch in scroll direction
+PREFETCH_BEHIND = 1  # Neighbouring items to prefetch against scroll direction
+
+
+def get_prefetch_offsets(direction):
+    """ Offsets from focused item in order they should be prefetched """
+    direction = -1 if direction < 0 else 1
+    return [direction * x for x in range(1, PREFETCH_AHEAD + 1)] + [-direction * x for x in range(1, PREFETCH_BEHIND + 1)]
+
+
+class ListItemPrefetch(Thread):
+    """
+    Background worker which looks up details of neighbouring items so they are cached before they are focused
+    Queue is replaced each time focus changes so stale items are dropped rather than fetched
+    """
+    def __init__(self, func):
+        Thread.__init__(self, daemon=True)
+        self.exit = False
+        self._func = func
+        self._lock = Lock()
+        self._event = Event()
+        self._queue = []
+
+    def put(self, items):
+        """ Replace queued items with new items in order they should be fetched """
+        with self._lock:
+            self._queue = list(items)
+        self._event.set()
+
+    def cancel(self):
+        self.put([])
+
+    def _get_next(self):
+        with self._lock:
+            if not self._queue:
+                self._event.clear()
+                return
+            return self._queue.pop(0)
+
+    def run(self):
+        monitor = Monitor()
+        while not monitor.abortRequested() and not self.exit:
+            if not self._event.wait(1):
+                continue
+            item = self._get_next()
+            if not item:
+                continue
+            try:
+                self._func(item)
+            except Exception as exc:
+                kodi_traceback(exc, '\nlib.monitor.prefetch ListItemPrefetch')
+        del monitor
@@ -1,10 +1,25 @@
+import xbmcgui
 from xbmc import Monitor
 from resources.lib.addon.plugin import get_setting, get_condvisibility
 from resources.lib.addon.window import get_property, wait_for_property
 from resources.lib.monitor.cronjob import CronJobMonitor
 from resources.lib.monitor.listitem import ListItemMonitor
+from resources.lib.monitor.library import LibraryMonitor
 from resources.lib.monitor.player import PlayerMonitor
-from threading import Thread
+from resources.lib.monitor.trakt import TraktBroker
+from resources.lib.monitor.worker import DirectoryWorker
+from resources.lib.files.scache import SimpleCacheCleanup, flush_writers
+from resources.lib.files.futils import json_dumps as data_dumps
+from threading import Thread, Event
+from time import perf_counter as timer
+
+
+STATE_STOP, STATE_FULLSCREEN, STATE_IDLE, STATE_MODAL, STATE_CONTEXT, STATE_SCROLL, STATE_LISTITEM, STATE_CLEAR = (
+    'stop', 'fullscreen', 'idle', 'modal', 'context', 'scroll', 'listitem', 'clear')
+STATE_EXPIRES = 2  # Seconds before conditions are evaluated again even though window and focus signals are unchanged
+SKIN_SETTINGS_EXPIRES = 10  # Seconds before skin settings which enable service are checked again
+STATS_INTERVAL = 60  # Seconds between publishing service loop counters to ServiceStats property
+CLEAR_BACKOFF_MAX = 2  # Max seconds to wait between checks when nothing needs monitoring
 
 
 def restart_service_monitor():
@@ -14,15 +29,84 @@ def restart_service_monitor():
     Thread(target=ServiceMonitor().run).start()
 
 
+class _ServiceNotifications(Monitor):
+    """ Tracks screensaver and player events so service can wake early from long waits """
+    def __init__(self):
+        Monitor.__init__(self)
+        self.screensaver = get_condvisibility("System.ScreenSaverActive")
+        self.wake = Event()
+
+    def onScreensaverActivated(self):
+        self.screensaver = True
+
+    def onScreensaverDeactivated(self):
+        self.screensaver = False
+        self.wake.set()
+
+    def onNotification(self, sender, method, data):
+        if method in ('Player.OnAVStart', 'Player.OnStop', 'GUI.OnScreensaverDeactivated'):
+            self.wake.set()
+
+    def wait(self, seconds):
+        """ Wait for seconds or until woken by an event. Returns True if abort requested """
+        if seconds <= 1:
+            return self.waitForAbort(seconds)
+        self.wake.clear()
+        while seconds > 0 and not self.wake.is_set():
+            if self.waitForAbort(min(seconds, 1)):
+                return True
+            seconds -= 1
+        return False
+
+
+class ServiceStats(object):
+    """ Counts loop wakeups, condition evaluations and time spent per state for ServiceStats property """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.time_start = self.time_state = timer()
+        self.wakeups = 0
+        self.evaluations = 0
+        self.state_time = {}
+
+    def on_wakeup(self, state):
+        time_now = timer()
+        self.wakeups += 1
+        if state:
+            self.state_time[state] = self.state_time.get(state, 0) + time_now - self.time_state
+        self.time_state = time_now
+        if time_now - self.time_start < STATS_INTERVAL:
+            return
+        minutes = (time_now - self.time_start) / 60
+        get_property('ServiceStats', set_property=data_dumps({
+            'wakeups_per_minute': round(self.wakeups / minutes, 1),
+            'evaluations_per_minute': round(self.evaluations / minutes, 1),
+            'state_time': {k: round(v, 1) for k, v in self.state_time.items()}}))
+        self.reset()
+
+
 class ServiceMonitor(object):
     def __init__(self):
         self.exit = False
         self.listitem = None
         self.cron_job = CronJobMonitor(get_setting('library_autoupdate_hour', 'int'))
         self.cron_job.setName('Cron Thread')
+        self.library_monitor = LibraryMonitor()
+        self.library_monitor.setName('Library Thread')
+        self.trakt_broker = TraktBroker() if get_setting('trakt_background_sync') else None
         self.player_monitor = None
         self.listitem_monitor = ListItemMonitor()
-        self.xbmc_monitor = Monitor()
+        self.xbmc_monitor = _ServiceNotifications()
+        self.cache_cleanup = SimpleCacheCleanup()
+        self.stats = ServiceStats()
+        self._state = None
+        self._state_signal = None
+        self._state_expires = 0
+        self._skin_enabled = None
+        self._skin_expires = 0
+        self._clear_backoff = 1
+        self.directory_worker = DirectoryWorker() if get_setting('directory_worker') else None
 
     def _on_listitem(self):
         self.listitem_monitor.get_listitem()
@@ -38,7 +122,11 @@ class ServiceMonitor(object):
         self.xbmc_monitor.waitForAbort(1)
 
     def _on_idle(self):
-        self.xbmc_monitor.waitForAbort(30)
+        if self.cache_cleanup.do_cleanup_slice():  # Sweep expired cache items in small slices while idle
+            return self.xbmc_monitor.waitForAbort(0.2)
+        if self.cache_cleanup.do_vacuum_slice():  # Once-off VACUUM of older databases is only done once user is idle
+            return self.xbmc_monitor.waitForAbort(0.2)
+        self.xbmc_monitor.wait(30)  # Screensaver deactivating wakes us early
 
     def _on_modal(self):
         self.xbmc_monitor.waitForAbort(1)
@@ -53,76 +141,148 @@ class ServiceMonitor(object):
         Otherwise we should sit for a second so we aren't constantly polling
         """
         if self.listitem_monitor.properties or self.listitem_monitor.index_properties:
+            self._clear_backoff = 1
             return self.listitem_monitor.clear_properties()
         self.listitem_monitor.blur_fallback()
-        self.xbmc_monitor.waitForAbort(1)
+        self.cache_cleanup.do_cleanup_slice()
+        self.xbmc_monitor.waitForAbort(self._clear_backoff)
+        self._clear_backoff = min(self._clear_backoff + 0.1, CLEAR_BACKOFF_MAX)  # Back off while nothing changes
 
     def _on_exit(self):
-        if not self.xbmc_monitor.abortRequested():
-            self.listitem_monitor.clear_properties()
-            get_property('ServiceStarted', clear_property=True)
-            get_property('ServiceStop', clear_property=True)
+        try:
+            self.listitem_monitor.cancel_prefetch(exit=True)
+            self.listitem_monitor.save_itemcache()
+            if self.directory_worker:
+                self.directory_worker.stop()
+            if self.trakt_broker and self.trakt_broker.is_alive():
+                self.trakt_broker.stop()
+            if not self.xbmc_monitor.abortRequested():
+                self.listitem_monitor.clear_properties()
+                get_property('ServiceStarted', clear_property=True)
+                get_property('ServiceStop', clear_property=True)
+                get_property('ServiceStats', clear_property=True)
+        finally:
+            flush_writers()
         del self.player_monitor
         del self.listitem_monitor
         del self.xbmc_monitor
 
+    def get_skin_enabled(self):
+        """ Skin settings which enable service rarely change so only check them every SKIN_SETTINGS_EXPIRES seconds """
+        if self._skin_enabled is None or self._skin_expires < timer():
+            self._skin_enabled = get_condvisibility(
+                "Skin.HasSetting(TMDbHelper.Service) | "
+                "Skin.HasSetting(TMDbHelper.EnableBlur) | "
+                "Skin.HasSetting(TMDbHelper.EnableDesaturate) | "
+                "Skin.HasSetting(TMDbHelper.EnableColors)")
+            self._skin_expires = timer() + SKIN_SETTINGS_EXPIRES
+        return self._skin_enabled
+
+    def get_signal(self):
+        """ Cheap signals which change whenever the more expensive state conditions could change """
+        return (
+            xbmcgui.getCurrentWindowId(),
+            xbmcgui.getCurrentWindowDialogId(),
+            get_property('WidgetContainer'),
+            self.xbmc_monitor.screensaver,
+            self.get_skin_enabled())
+
+    def get_state(self):
+        """ Evaluate compound conditions only when signals change or state has expired """
+        if get_property('ServiceStop'):
+            return STATE_STOP
+
+        signal = self.get_signal()
+        if signal == self._state_signal and self._state_expires > timer():
+            if self._state in (STATE_SCROLL, STATE_LISTITEM):  # Focus changes within window so scrolling needs checking each time
+                return STATE_SCROLL if get_condvisibility("Container.Scrolling") else STATE_LISTITEM
+            return self._state
+
+        self.stats.evaluations += 1
+        self._state_signal = signal
+        self._state_expires = timer() + STATE_EXPIRES
+
+        # If we're in fullscreen video then we should update the playermonitor time
+        if get_condvisibility("Window.IsVisible(fullscreenvideo)"):
+            return STATE_FULLSCREEN
+
+        # Sit idle in a holding pattern if the skin doesn't need the service monitor yet
+        if self.xbmc_monitor.screensaver or not self._skin_enabled:
+            return STATE_IDLE
+
+        # skip when modal or busy dialogs are opened (e.g. select / progress / busy etc.)
+        if get_condvisibility(
+                "Window.IsActive(DialogSelect.xml) | "
+                "Window.IsActive(progressdialog) | "
+                "Window.IsActive(busydialog) | "
+                "Window.IsActive(shutdownmenu) | "
+                "!String.IsEmpty(Window.Property(TMDbHelper.ServicePause))"):
+            return STATE_MODAL
+
+        # manage context menu separately from other modals to pass info through
+        if get_condvisibility(
+                "Window.IsActive(contextmenu) | "
+                "!String.IsEmpty(Window.Property(TMDbHelper.ContextMenu))"):
+            return STATE_CONTEXT
+
+        # skip when container scrolling
+        if get_condvisibility("Container.Scrolling"):
+            return STATE_SCROLL
+
+        # media window is opened or widgetcontainer set - start listitem monitoring!
+        if get_condvisibility(
+                "Window.IsMedia | "
+                "Window.IsVisible(MyPVRChannels.xml) | "
+                "Window.IsVisible(MyPVRGuide.xml) | "
+                "Window.IsVisible(DialogPVRInfo.xml) | "
+                "!String.IsEmpty(Window(Home).Property(TMDbHelper.WidgetContainer)) | "
+                "Window.IsVisible(movieinformation)"):
+            return STATE_LISTITEM
+
+        # Otherwise just sit here and wait
+        return STATE_CLEAR
+
     def poller(self):
-        while not self.xbmc_monitor.abortRequested() and not self.exit:
-            if get_property('ServiceStop'):
-                self.cron_job.exit = True
-                self.exit = True
-
-            # If we're in fullscreen video then we should update the playermonitor time
-            elif get_condvisibility("Window.IsVisible(fullscreenvideo)"):
-                self._on_fullscreen()
-
-            # Sit idle in a holding pattern if the skin doesn't need the service monitor yet
-            elif get_condvisibility(
-                    "System.ScreenSaverActive | "
-                    "[!Skin.HasSetting(TMDbHelper.Service) + "
-                    "!Skin.HasSetting(TMDbHelper.EnableBlur) + "
-                    "!Skin.HasSetting(TMDbHelper.EnableDesaturate) + "
-                    "!Skin.HasSetting(TMDbHelper.EnableColors)]"):
-                self._on_idle()
-
-            # skip when modal or busy dialogs are opened (e.g. select / progress / busy etc.)
-            elif get_condvisibility(
-                    "Window.IsActive(DialogSelect.xml) | "
-                    "Window.IsActive(progressdialog) | "
-                    "Window.IsActive(busydialog) | "
-                    "Window.IsActive(shutdownmenu) | "
-                    "!String.IsEmpty(Window.Property(TMDbHelper.ServicePause))"):
-                self._on_modal()
-
-            # manage context menu separately from other modals to pass info through
-            elif get_condvisibility(
-                    "Window.IsActive(contextmenu) | "
-                    "!String.IsEmpty(Window.Property(TMDbHelper.ContextMenu))"):
-                self._on_context()
-
-            # skip when container scrolling
-            elif get_condvisibility("Container.Scrolling"):
-                self._on_scroll()
-
-            # media window is opened or widgetcontainer set - start listitem monitoring!
-            elif get_condvisibility(
-                    "Window.IsMedia | "
-                    "Window.IsVisible(MyPVRChannels.xml) | "
-                    "Window.IsVisible(MyPVRGuide.xml) | "
-                    "Window.IsVisible(DialogPVRInfo.xml) | "
-                    "!String.IsEmpty(Window(Home).Property(TMDbHelper.WidgetContainer)) | "
-                    "Window.IsVisible(movieinformation)"):
-                self._on_listitem()
-
-            # Otherwise just sit here and wait
-            else:
-                self._on_clear()
+        routes = {
+            STATE_FULLSCREEN: self._on_fullscreen,
+            STATE_IDLE: self._on_idle,
+            STATE_MODAL: self._on_modal,
+            STATE_CONTEXT: self._on_context,
+            STATE_SCROLL: self._on_scroll,
+            STATE_LISTITEM: self._on_listitem,
+            STATE_CLEAR: self._on_clear}
+
+        try:
+            while not self.xbmc_monitor.abortRequested() and not self.exit:
+                self.stats.on_wakeup(self._state)
+                state = self.get_state()
+                if state != STATE_CLEAR:
+                    self._clear_backoff = 1
+                self._state = state
+
+                if state == STATE_STOP:
+                    self.cron_job.exit = True
+                    self.library_monitor.exit = True
+                    if self.trakt_broker:
+                        self.trakt_broker.exit = True
+                    self.exit = True
+                    continue
+
+                routes[state]()
 
         # Some clean-up once service exits
-        self._on_exit()
+        finally:
+            self._on_exit()
 
     def run(self):
         get_property('ServiceStarted', 'True')
         self.cron_job.start()
+        self.library_monitor.start()
+        if self.trakt_broker:
+            self.trakt_broker.setName('Trakt Thread')
+            self.trakt_broker.start()
+        if self.directory_worker:
+            self.directory_worker.setName('Directory Worker Thread')
+            self.directory_worker.start()
         self.player_monitor = PlayerMonitor()
         self.poller()
@@ -0,0 +1,86 @@
+from xbmc import Monitor
+from threading import Thread
+from resources.lib.addon.logger import kodi_log
+from resources.lib.addon.window import get_property
+
+""" Lazyimports
+from resources.lib.api.trakt.api import TraktAPI
+"""
+
+
+TRAKT_BROKER_POLL = 60  # Seconds between checks of sync/last_activities
+TRAKT_BROKER_JOIN = 5  # Seconds service waits for broker to finish request in progress when exiting
+TRAKT_BROKER_EXPIRES = 180  # Seconds published last_activities stay valid so plugins don't check Trakt themselves while broker is running
+TRAKT_BROKER_SYNC = (
+    ('watched', 'movie', 'tmdb', None),
+    ('watched', 'show', 'tmdb', 'full'),
+    ('playback', 'movie', 'tmdb', None),
+    ('playback', 'show', 'tmdb', None))  # (sync_type, trakt_type, id_type, extended) lists used to build widgets
+
+
+class TraktBroker(Thread):
+    """
+    Polls Trakt last_activities for plugin processes and refreshes stale sync lists in the background
+    Sync lists are refreshed before new last_activities are published so plugins only ever read them from cache
+    """
+    def __init__(self):
+        Thread.__init__(self)
+        self.daemon = True
+        self.exit = False
+        self.xbmc_monitor = Monitor()
+        self.last_activities = None
+        self._trakt_api = None
+
+    @property
+    def trakt_api(self):
+        """ Client is created once and kept for session so connections and modules are reused between polls """
+        if self._trakt_api is None:
+            from resources.lib.api.trakt.api import TraktAPI
+            self._trakt_api = TraktAPI()
+        return self._trakt_api
+
+    def authorize(self):
+        """ Pick up login, logout or token refresh from other processes since last poll """
+        trakt_api = self.trakt_api
+        access_token = trakt_api.get_stored_token().get('access_token')
+        if trakt_api.authorization and trakt_api.authorization.get('access_token') != access_token:
+            trakt_api.authorization = ''
+            trakt_api.headers.pop('Authorization', None)
+        return trakt_api.authorize()
+
+    def update(self):
+        if not self.authorize():
+            return
+
+        trakt_api = self.trakt_api
+        response = trakt_api.get_response_json('sync/last_activities')
+        if not response:
+            return
+        if response != self.last_activities:
+            trakt_api.sync = {}  # Lists kept from previous poll are stale now activities have changed
+            trakt_api.last_activities = response  # Compare cached sync lists against new activities before other processes see them
+            for sync_type, trakt_type, id_type, extended in TRAKT_BROKER_SYNC:
+                trakt_api.get_sync(sync_type, trakt_type, id_type, extended=extended)
+            trakt_api.get_watched_index('tmdb')
+            if self.last_activities:
+                kodi_log(f'TraktBroker refreshed sync lists for activity {response.get("all")}', 2)
+            self.last_activities = response
+        trakt_api._set_last_activities(response, TRAKT_BROKER_EXPIRES)
+
+    def run(self):
+        poll_time = 0
+        while not self.xbmc_monitor.abortRequested() and not self.exit:
+            if poll_time > 0:
+                poll_time -= 1
+                self.xbmc_monitor.waitForAbort(1)
+                continue
+            self.update()
+            poll_time = TRAKT_BROKER_POLL
+        self._trakt_api = None
+        if not self.xbmc_monitor.abortRequested():
+            get_property('TraktSyncLastActivities.Expires', clear_property=True)  # Plugins check Trakt themselves again
+        del self.xbmc_monitor
+
+    def stop(self):
+        self.exit = True
+        self.join(TRAKT_BROKER_JOIN)
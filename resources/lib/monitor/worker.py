@@ -0,0 +1,123 @@
+import socket
+from hmac import compare_digest
+from secrets import token_hex
+from threading import Thread, BoundedSemaphore
+from xbmc import Monitor
+from xbmcgui import Window
+from resources.lib.addon.logger import kodi_log
+from resources.lib.items.remote import (
+    WORKER_PORT_PROPERTY, WORKER_TOKEN_PROPERTY, WORKER_RESPONSE_TIMEOUT, WORKER_REQUEST_MAX_BYTES,
+    send_message, recv_message)
+
+""" Lazyimports
+from resources.lib.items.router import Router
+"""
+
+
+WORKER_POLL_TIMEOUT = 1  # Seconds between checks for abort when waiting for connections
+WORKER_REQUEST_TIMEOUT = 5  # Seconds client has to send request after connecting
+WORKER_MAX_HANDLERS = 4  # Directories built at once -- further clients are told to build locally
+
+
+def build_remote_directory(paramstring):
+    """ Build plugin:// directory in this process and return response for get_remote_directory() """
+    from resources.lib.items.router import Router
+    router = Router(-1, paramstring)
+    container = router.get_container()
+    items = container.get_directory(items_only=True)
+    if not items:
+        return {'items': None}
+    return {
+        'items': [(li.get_url(), li.get_listitem_data(), li.is_folder) for li in items if li],
+        'properties': container.property_params or {},
+        'plugin_category': container.plugin_category,
+        'container_content': container.container_content,
+        'sort_methods': container.sort_methods,
+        'update_listing': container.update_listing,
+        'container_update': container.container_update,
+        'container_refresh': container.container_refresh}
+
+
+class DirectoryWorker(Thread):
+    """
+    Keeps addon modules, API sessions and caches warm in the service process
+    Plugin invocations connect on localhost and receive the built directory instead of building it themselves
+    """
+    def __init__(self):
+        Thread.__init__(self)
+        self.daemon = True
+        self.exit = False
+        self.xbmc_monitor = Monitor()
+        self.server = None
+        self.token = token_hex(16)
+        self._handlers = BoundedSemaphore(WORKER_MAX_HANDLERS)
+
+    def _handle(self, conn):
+        try:
+            self._handle_request(conn)
+        finally:
+            self._handlers.release()
+
+    def _handle_request(self, conn):
+        with conn:
+            try:
+                conn.settimeout(WORKER_REQUEST_TIMEOUT)
+                request = recv_message(conn, max_length=WORKER_REQUEST_MAX_BYTES)
+                if not compare_digest(f'{request.get("token")}', self.token):
+                    kodi_log('DirectoryWorker - Refused request with invalid token', 1)
+                    return
+                conn.settimeout(WORKER_RESPONSE_TIMEOUT)
+                try:
+                    response = build_remote_directory(request['paramstring'])
+                except Exception as exc:
+                    kodi_log(f'DirectoryWorker - Error building {request.get("paramstring")}\n{exc}', 1)
+                    response = {'error': f'{exc}'}
+                send_message(conn, response)
+            except (OSError, ValueError, KeyError, AttributeError) as exc:
+                kodi_log(f'DirectoryWorker - Connection error\n{exc}', 2)
+
+    def _refuse(self, conn):
+        """ Tell client to build directory itself because all handlers are busy """
+        with conn:
+            try:
+                conn.settimeout(WORKER_POLL_TIMEOUT)
+                send_message(conn, {'error': 'busy'})
+            except OSError:
+                pass
+
+    def _serve(self):
+        while not self.xbmc_monitor.abortRequested() and not self.exit:
+            try:
+                conn, addr = self.server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if not self._handlers.acquire(blocking=False):
+                self._refuse(conn)
+                continue
+            Thread(target=self._handle, args=(conn, )).start()
+
+    def run(self):
+        try:
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.bind(('127.0.0.1', 0))
+            self.server.listen(16)
+            self.server.settimeout(WORKER_POLL_TIMEOUT)
+        except OSError as exc:
+            kodi_log(f'DirectoryWorker - Unable to start\n{exc}', 1)
+            return
+        Window(10000).setProperty(WORKER_TOKEN_PROPERTY, self.token)
+        Window(10000).setProperty(WORKER_PORT_PROPERTY, f'{self.server.getsockname()[1]}')
+        kodi_log(f'DirectoryWorker - Listening on port {self.server.getsockname()[1]}', 2)
+        try:
+            self._serve()
+        finally:
+            Window(10000).clearProperty(WORKER_PORT_PROPERTY)
+            Window(10000).clearProperty(WORKER_TOKEN_PROPERTY)
+            self.server.close()
+
+    def stop(self):
+        self.exit = True
+        Window(10000).clearProperty(WORKER_PORT_PROPERTY)
+        Window(10000).clearProperty(WORKER_TOKEN_PROPERTY)
@@ -370,6 +370,42 @@ def log_request(**kwargs):
         Dialog().textviewer(filename, dumps(kwargs['response'], indent=2))
 
 
+def benchmark_cache(benchmark_cache=None, limit=100, **kwargs):
+    """ Decode largest cached rows (e.g. TMDb get_details_request payloads) through each cache codec and report timings """
+    from xbmcgui import Dialog
+    from tmdbhelper.parser import try_int
+    from resources.lib.addon.dialog import BusyDialog
+    from resources.lib.files.bcache import BasicCache
+    from resources.lib.files.scache import benchmark_codecs
+    filename = benchmark_cache if benchmark_cache and benchmark_cache is not True else 'TMDb.db'
+    with BusyDialog():
+        cache = BasicCache(filename).ret_cache()
+        query = "SELECT data FROM simplecache ORDER BY length(data) DESC LIMIT ?"
+        rows = cache._execute_sql(query, (try_int(limit) or 100,))
+        rows = [i[0] for i in rows.fetchall()] if rows else []
+        results = benchmark_codecs(rows)
+    msg = '\n'.join([
+        f'Codec {k}: encode {v[0] * 1000:.1f}ms decode {v[1] * 1000:.1f}ms size {v[2] // 1024}KB'
+        for k, v in results.items()])
+    Dialog().textviewer(f'{filename} ({len(rows)} rows)', msg)
+
+
+def benchmark_images(benchmark_images=None, repeats=5, **kwargs):
+    """ Time crop / blur / desaturate / colors image functions on artwork with a fresh decode for each repeat """
+    from xbmcgui import Dialog
+    from tmdbhelper.parser import try_int
+    from resources.lib.addon.dialog import BusyDialog
+    from resources.lib.monitor.images import benchmark_images as _benchmark_images
+    source = benchmark_images if benchmark_images and benchmark_images is not True else None
+    source = source or Dialog().browse(2, 'benchmark_images', 'files', '.jpg|.jpeg|.png')
+    if not source:
+        return
+    with BusyDialog():
+        results = _benchmark_images(source, repeats=try_int(repeats) or 5)
+    msg = '\n'.join([f'{k}: {v * 1000:.1f}ms' for k, v in results.items()])
+    Dialog().textviewer(f'{source} ({try_int(repeats) or 5} repeats)', msg)
+
+
 def delete_cache(delete_cache, **kwargs):
     from xbmcgui import Dialog
     from resources.lib.items.builder import ItemBuilder
@@ -80,6 +80,10 @@ class Script(object):
             lambda **kwargs: importmodule('resources.lib.script.method', 'library_autoupdate')(**kwargs),
         'log_request':
             lambda **kwargs: importmodule('resources.lib.script.method', 'log_request')(**kwargs),
+        'benchmark_cache':
+            lambda **kwargs: importmodule('resources.lib.script.method', 'benchmark_cache')(**kwargs),
+        'benchmark_images':
+            lambda **kwargs: importmodule('resources.lib.script.method', 'benchmark_images')(**kwargs),
         'delete_cache':
             lambda **kwargs: importmodule('resources.lib.script.method', 'delete_cache')(**kwargs),
         'wikipedia':
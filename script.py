@@ -3,5 +3,11 @@
 # License: GPL v.3 https://www.gnu.org/copyleft/gpl.html
 if __name__ == '__main__':
     import sys
-    from resources.lib.script.router import Script
-    Script(*sys.argv[1:]).router()
+    from resources.lib.addon.importtime import ImportProfiler
+    with ImportProfiler('script'):
+        from resources.lib.script.router import Script
+        from resources.lib.files.scache import flush_writers
+        try:
+            Script(*sys.argv[1:]).router()
+        finally:
+            flush_writers()  # Writer threads are daemons so commit queued cache rows before interpreter exits
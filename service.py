@@ -1,5 +1,8 @@
-from resources.lib.monitor.service import ServiceMonitor
+from resources.lib.addon.importtime import ImportProfiler
 
 
 if __name__ == '__main__':
-    ServiceMonitor().run()
+    with ImportProfiler('service'):
+        from resources.lib.monitor.service import ServiceMonitor
+        service_monitor = ServiceMonitor()
+    service_monitor.run()